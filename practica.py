@@ -1,38 +1,68 @@
+import time
+_STARTUP_T0 = time.perf_counter()  # inicio del arranque, antes de cualquier import pesado
+
+import sys
+import importlib
+import importlib.util
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog
-from datetime import datetime
-from typing import List, Dict, Optional, Callable
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Callable, Set, Iterable, Iterator, TextIO
 from abc import ABC, abstractmethod
 import json
+import random
+import tempfile
 import csv
-from dataclasses import dataclass, asdict
+import sqlite3
+import os
+import shutil
+import struct
+from dataclasses import dataclass, asdict, field
+from contextlib import contextmanager, ExitStack
 from enum import Enum
 import threading
 import queue
-from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from collections import OrderedDict, deque
+from collections.abc import Sequence
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from array import array
+
+# Dependencias opcionales: solo se comprueba que estén instaladas; los módulos
+# se importan la primera vez que se usan (OpenCV tarda cientos de ms en cargar)
+def _module_available(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
 
 # Para generar PDFs
-try:
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib import colors
-    from reportlab.lib.units import inch
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
+PDF_AVAILABLE = _module_available('reportlab')
+if not PDF_AVAILABLE:
     print("⚠️ ReportLab no está instalado. Instale con: pip install reportlab")
 
 # Para scanner de código de barras
-try:
-    import cv2
-    from pyzbar import pyzbar
-    BARCODE_AVAILABLE = True
-except ImportError:
-    BARCODE_AVAILABLE = False
+BARCODE_AVAILABLE = _module_available('cv2') and _module_available('pyzbar')
+if not BARCODE_AVAILABLE:
     print("⚠️ Librerías de barcode no disponibles. Instale con: pip install opencv-python pyzbar")
 
+OPTIONAL_MODULES = ('reportlab', 'cv2', 'pyzbar')
+
+
+def load_barcode_libs() -> tuple:
+    """Importar (cv2, pyzbar, numpy) bajo demanda"""
+    if not BARCODE_AVAILABLE:
+        raise Exception("Librerías de barcode no disponibles")
+    try:
+        import cv2
+        import numpy as np
+        from pyzbar import pyzbar
+    except ImportError as e:  # p. ej. falta la biblioteca nativa zbar
+        raise Exception(f"Librerías de barcode no disponibles: {e}") from e
+    return cv2, pyzbar, np
+
 
 # ============= ENUMERACIONES =============
 
@@ -83,15 +113,19 @@ class StockMovement:
     description: str
     user: str
     timestamp: datetime
+    movement_id: Optional[int]
     
     def __init__(self, product_code: str, quantity: int, movement_type: MovementType, 
-                 description: str = "", user: str = "Sistema"):
+                 description: str = "", user: str = "Sistema",
+                 timestamp: Optional[datetime] = None):
         self.product_code = product_code
         self.quantity = quantity
         self.movement_type = movement_type
         self.description = description
         self.user = user
-        self.timestamp = datetime.now()
+        # Permite importar historial con su fecha original
+        self.timestamp = timestamp if timestamp is not None else datetime.now()
+        self.movement_id = None  # asignado por el repositorio
     
     def to_dict(self) -> Dict:
         return {
@@ -104,6 +138,53 @@ class StockMovement:
         }
 
 
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch_us(moment: datetime) -> int:
+    """Convertir una fecha a microsegundos desde 1970 (entero ordenable)"""
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def from_epoch_us(value: int) -> datetime:
+    """Convertir microsegundos desde 1970 a fecha"""
+    return EPOCH + timedelta(microseconds=value)
+
+
+@dataclass
+class Reservation:
+    """Reserva de stock para un pedido, con vencimiento opcional"""
+    reservation_id: str
+    product_code: str
+    quantity: int
+    owner: str = "Sistema"
+    created: datetime = field(default_factory=datetime.now)
+    expires_at: Optional[datetime] = None
+    
+    def __post_init__(self):
+        if self.quantity <= 0:
+            raise ValueError("La cantidad reservada debe ser positiva")
+    
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        return self.expires_at is not None and self.expires_at <= (now or datetime.now())
+    
+    def to_dict(self) -> Dict:
+        return {
+            'reservation_id': self.reservation_id,
+            'product_code': self.product_code,
+            'quantity': self.quantity,
+            'owner': self.owner,
+            'created': self.created.isoformat(),
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Reservation':
+        return cls(data['reservation_id'], data['product_code'], data['quantity'], data['owner'],
+                   datetime.fromisoformat(data['created']),
+                   datetime.fromisoformat(data['expires_at']) if data['expires_at'] else None)
+
+
 class InventoryItem:
     """Gestión de stock con análisis avanzado"""
     
@@ -111,6 +192,7 @@ class InventoryItem:
         self._product = product
         self._quantity = quantity
         self._reserved_quantity = 0
+        self._reservations: Dict[str, Reservation] = {}
     
     @property
     def product(self) -> Product:
@@ -141,11 +223,32 @@ class InventoryItem:
             raise ValueError(f"Stock insuficiente. Disponible: {self.available_quantity}")
         self._quantity -= quantity
     
-    def reserve_stock(self, quantity: int) -> None:
-        """Reservar stock para pedidos"""
-        if quantity > self.available_quantity:
-            raise ValueError(f"No hay suficiente stock disponible para reservar")
-        self._reserved_quantity += quantity
+    @property
+    def reservations(self) -> List[Reservation]:
+        return list(self._reservations.values())
+    
+    def add_reservation(self, reservation: Reservation) -> None:
+        """Apartar stock para una reserva identificada"""
+        if reservation.reservation_id in self._reservations:
+            raise ValueError(f"La reserva {reservation.reservation_id} ya existe")
+        if reservation.quantity > self.available_quantity:
+            raise ValueError(f"No hay suficiente stock disponible para reservar. Disponible: {self.available_quantity}")
+        self._reservations[reservation.reservation_id] = reservation
+        self._reserved_quantity += reservation.quantity
+    
+    def release_reservation(self, reservation_id: str) -> Reservation:
+        """Liberar una reserva devolviendo el stock a disponible"""
+        reservation = self._reservations.pop(reservation_id, None)
+        if reservation is None:
+            raise ValueError(f"Reserva {reservation_id} no encontrada")
+        self._reserved_quantity -= reservation.quantity
+        return reservation
+    
+    def commit_reservation(self, reservation_id: str) -> Reservation:
+        """Confirmar una reserva: el stock reservado sale del inventario"""
+        reservation = self.release_reservation(reservation_id)
+        self._quantity -= reservation.quantity
+        return reservation
     
     def get_alert_level(self) -> AlertLevel:
         """Determinar el nivel de alerta del stock"""
@@ -177,6 +280,9 @@ class InventoryItem:
 class Repository(ABC):
     """Interfaz base para repositorios con operaciones CRUD"""
     
+    # True si el repositorio guarda sus datos por sí mismo (p. ej. SQLite)
+    persistent = False
+    
     @abstractmethod
     def add(self, item) -> None:
         pass
@@ -202,26 +308,111 @@ class Repository(ABC):
         pass
 
 
+class TrigramIndex:
+    """Índice invertido de trigramas para búsqueda por subcadena (consultas de 3+ caracteres)"""
+    
+    def __init__(self):
+        self._postings: Dict[str, Set[str]] = {}
+        self._keys: Dict[str, Set[str]] = {}  # clave -> trigramas que la indexan
+    
+    @staticmethod
+    def _grams(text: str) -> Set[str]:
+        text = text.lower()
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+    
+    def add(self, key: str, text: str) -> None:
+        grams = self._grams(text)
+        self._keys[key] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(key)
+    
+    def remove(self, key: str) -> None:
+        for gram in self._keys.pop(key, ()):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+    
+    def estimate(self, query: str) -> int:
+        """Cota superior de candidatos: tamaño de la lista de trigramas más corta"""
+        return min((len(self._postings.get(gram, ())) for gram in self._grams(query)), default=0)
+    
+    def candidates(self, query: str) -> Set[str]:
+        """Claves que pueden contener la consulta (hay que verificar después)"""
+        postings = []
+        for gram in self._grams(query):
+            keys = self._postings.get(gram)
+            if not keys:
+                return set()
+            postings.append(keys)
+        postings.sort(key=len)
+        
+        result = set(postings[0])
+        for keys in postings[1:]:
+            result &= keys
+            if not result:
+                break
+        return result
+
+
 class ProductRepository(Repository):
     """Repositorio de productos con capacidades de búsqueda"""
     
     def __init__(self):
         self._products: Dict[str, Product] = {}
-    
-    def add(self, product: Product) -> None:
+        self._barcode_index: Dict[str, str] = {}  # barcode -> código de producto
+        # Un índice de trigramas por campo: el campo determina la relevancia
+        self._text_indexes = {field: TrigramIndex() for field in ('code', 'name', 'description')}
+        # Filas (código, nombre y descripción en minúsculas) ordenadas por código,
+        # y (nombre en minúsculas, código) ordenados para búsqueda por prefijo;
+        # se mantienen con insort/bisect en cada alta, cambio o baja
+        self._rows: List[tuple] = []
+        self._rows_by_code: Dict[str, tuple] = {}
+        self._name_order: List[tuple] = []
+        self._category_index: Dict[str, Set[str]] = {}  # categoría -> códigos
+    
+    def _check_barcode(self, barcode: str, code: str) -> None:
+        """Validar que el código de barras no esté asignado a otro producto"""
+        owner = self._barcode_index.get(barcode)
+        if barcode and owner is not None and owner != code:
+            raise ValueError(f"El código de barras {barcode} ya está asignado al producto {owner}")
+    
+    def _insert(self, product: Product, ordered: bool = True) -> tuple:
         if self.exists(product.code):
             raise ValueError(f"El producto {product.code} ya existe")
+        self._check_barcode(product.barcode, product.code)
         self._products[product.code] = product
+        if product.barcode:
+            self._barcode_index[product.barcode] = product.code
+        self._index_category(product)
+        return self._index_text(product, ordered)
+    
+    def add(self, product: Product) -> None:
+        self._insert(product)
+    
+    def add_many(self, products: List[Product]) -> None:
+        """Agregar un lote de productos; las filas ordenadas se fusionan una sola vez"""
+        added = []
+        try:
+            for product in products:
+                added.append(self._insert(product, ordered=False))
+        finally:
+            # timsort aprovecha el tramo ya ordenado: O(n + k log k) para k productos nuevos
+            self._rows.extend(added)
+            self._rows.sort()
+            self._name_order.extend((row[2], row[1]) for row in added)
+            self._name_order.sort()
     
     def get(self, code: str) -> Optional[Product]:
         return self._products.get(code)
     
     def get_by_barcode(self, barcode: str) -> Optional[Product]:
-        """Buscar producto por código de barras"""
-        for product in self._products.values():
-            if product.barcode == barcode:
-                return product
-        return None
+        """Buscar producto por código de barras (O(1) mediante índice)"""
+        code = self._barcode_index.get(barcode)
+        if code is None:
+            return None
+        return self._products.get(code)
     
     def get_all(self) -> List[Product]:
         return list(self._products.values())
@@ -229,136 +420,1651 @@ class ProductRepository(Repository):
     def update(self, code: str, product: Product) -> None:
         if not self.exists(code):
             raise ValueError(f"El producto {code} no existe")
+        if product.code != code:
+            raise ValueError(f"No se puede cambiar el código del producto {code} a {product.code}")
+        self._check_barcode(product.barcode, code)
+        old = self._products[code]
+        if old.barcode:
+            self._barcode_index.pop(old.barcode, None)
         self._products[code] = product
+        if product.barcode:
+            self._barcode_index[product.barcode] = code
+        self._unindex_text(code)
+        self._index_text(product)
+        self._unindex_category(old)
+        self._index_category(product)
     
     def delete(self, code: str) -> None:
         if code in self._products:
-            del self._products[code]
+            product = self._products.pop(code)
+            if product.barcode:
+                self._barcode_index.pop(product.barcode, None)
+            self._unindex_text(code)
+            self._unindex_category(product)
     
     def exists(self, code: str) -> bool:
         return code in self._products
     
-    def search(self, query: str) -> List[Product]:
-        """Buscar productos por código o nombre"""
-        query_lower = query.lower()
-        return [p for p in self._products.values() 
-                if query_lower in p.code.lower() or query_lower in p.name.lower()]
+    def _index_category(self, product: Product) -> None:
+        self._category_index.setdefault(product.category, set()).add(product.code)
+    
+    def _unindex_category(self, product: Product) -> None:
+        codes = self._category_index.get(product.category)
+        if codes is not None:
+            codes.discard(product.code)
+            if not codes:
+                del self._category_index[product.category]
+    
+    def _index_text(self, product: Product, ordered: bool = True) -> tuple:
+        """Indexar los textos; con ``ordered=False`` el llamador inserta la fila en las listas"""
+        for field, index in self._text_indexes.items():
+            index.add(product.code, getattr(product, field))
+        row = (product.code.lower(), product.code, product.name.lower(), product.description.lower())
+        self._rows_by_code[product.code] = row
+        if ordered:
+            insort(self._rows, row)
+            insort(self._name_order, (row[2], product.code))
+        return row
+    
+    def _unindex_text(self, code: str) -> None:
+        for index in self._text_indexes.values():
+            index.remove(code)
+        row = self._rows_by_code.pop(code)
+        del self._rows[bisect_left(self._rows, row)]
+        del self._name_order[bisect_left(self._name_order, (row[2], code))]
+    
+    @staticmethod
+    def _prefix_range(ordered: List[tuple], prefix: str) -> range:
+        return range(bisect_left(ordered, (prefix,)), bisect_left(ordered, (prefix + '\U0010ffff',)))
+    
+    # Posición de cada campo en las filas de _rows
+    _ROW_FIELDS = (('code', 0), ('name', 2), ('description', 3))
+    
+    def _substring_matches(self, field: str, position: int, query: str) -> Iterator[str]:
+        """Códigos cuyo campo contiene la consulta, en orden de código.
+        
+        Si el índice de trigramas del campo es selectivo se revisan solo sus
+        candidatos; si no (consultas cortas o muy comunes) se recorre el
+        catálogo en orden y el llamador se detiene al completar el límite.
+        """
+        rows = self._rows
+        index = self._text_indexes[field]
+        if len(query) >= 3 and index.estimate(query) <= len(rows) // 8:
+            rows = sorted(self._rows_by_code[code] for code in index.candidates(query))
+        for row in rows:
+            if query in row[position]:
+                yield row[1]
+    
+    def search(self, query: str, limit: Optional[int] = None) -> List[Product]:
+        """Buscar productos por código, nombre o descripción, ordenados por relevancia.
+        
+        Orden: código exacto, prefijo de código, prefijo de nombre, y
+        subcadena en código, nombre o descripción; dentro de cada grupo por
+        código. Los grupos se llenan en ese orden y la búsqueda se detiene al
+        alcanzar ``limit``.
+        """
+        query_lower = query.strip().lower()
+        if not query_lower:
+            products = self.get_all()
+            return products[:limit] if limit is not None else products
+        if limit is None:
+            limit = len(self._products)
+        
+        found: List[str] = []
+        seen: Set[str] = set()
+        
+        def take(codes: Iterable[str]) -> bool:
+            """Añadir códigos nuevos; True cuando se alcanzó el límite"""
+            for code in codes:
+                if len(found) >= limit:
+                    return True
+                if code not in seen:
+                    seen.add(code)
+                    found.append(code)
+            return len(found) >= limit
+        
+        # Código exacto y prefijo de código: rango contiguo (los exactos van primero)
+        rows = self._rows
+        done = take(rows[i][1] for i in self._prefix_range(rows, query_lower))
+        
+        if not done:
+            # Prefijo de nombre: rango contiguo ordenado por nombre; se reordena por código
+            names = self._name_order
+            in_range = (names[i][1] for i in self._prefix_range(names, query_lower))
+            matches = heapq.nsmallest(limit - len(found),
+                                      ((code.lower(), code) for code in in_range if code not in seen))
+            done = take(code for _, code in matches)
+        
+        # Subcadena en código, luego nombre, luego descripción
+        for field, position in self._ROW_FIELDS:
+            if done:
+                break
+            done = take(code for code in self._substring_matches(field, position, query_lower)
+                        if code not in seen)
+        
+        return [self._products[code] for code in found]
     
     def get_by_category(self, category: str) -> List[Product]:
         """Obtener productos por categoría"""
-        return [p for p in self._products.values() if p.category == category]
+        return [self._products[code] for code in self._category_index.get(category, ())]
     
     def get_categories(self) -> List[str]:
         """Obtener todas las categorías únicas"""
-        return list(set(p.category for p in self._products.values()))
+        return list(self._category_index)
+    
+    def get_category_count(self) -> int:
+        """Cantidad de categorías con al menos un producto"""
+        return len(self._category_index)
+
+
+class SequenceView(Sequence):
+    """Vista de solo lectura sobre una porción de una lista (sin copiarla)"""
+    
+    __slots__ = ('_data', '_start', '_stop')
+    
+    def __init__(self, data: List, start: int = 0, stop: Optional[int] = None):
+        self._data = data
+        self._start = start
+        self._stop = stop  # None: hasta el final actual de la lista
+    
+    def _range(self) -> range:
+        stop = len(self._data) if self._stop is None else self._stop
+        return range(self._start, stop)
+    
+    def __len__(self) -> int:
+        return len(self._range())
+    
+    def __getitem__(self, index):
+        positions = self._range()[index]
+        if isinstance(index, slice):
+            return [self._data[i] for i in positions]
+        return self._data[positions]
+    
+    def __iter__(self):
+        data = self._data
+        for i in self._range():
+            yield data[i]
+
+
+class ReversedView(Sequence):
+    """Vista en orden inverso de una secuencia (sin copiarla)"""
+    
+    __slots__ = ('_data',)
+    
+    def __init__(self, data: Sequence):
+        self._data = data
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def __getitem__(self, index):
+        size = len(self._data)
+        if isinstance(index, slice):
+            return [self._data[size - 1 - i] for i in range(size)[index]]
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("índice fuera de rango")
+        return self._data[size - 1 - index]
+
+
+def merge_sorted_run(keys, values, new_keys: List, new_values: List) -> None:
+    """Fusionar un lote en dos columnas paralelas ordenadas por clave.
+    
+    Ordena el lote (estable) y lo mezcla con la cola afectada en una sola
+    pasada, sin un insert por elemento. A igual clave los elementos ya
+    presentes quedan antes, igual que bisect_right.
+    """
+    if not new_keys:
+        return
+    if any(b < a for a, b in zip(new_keys, new_keys[1:])):
+        order = sorted(range(len(new_keys)), key=new_keys.__getitem__)
+        new_keys = [new_keys[i] for i in order]
+        new_values = [new_values[i] for i in order]
+    position = bisect_right(keys, new_keys[0])
+    if position == len(keys):
+        keys.extend(new_keys)
+        values.extend(new_values)
+        return
+    old_keys = keys[position:]
+    old_values = values[position:]
+    del keys[position:]
+    del values[position:]
+    i = j = 0
+    while i < len(old_keys) and j < len(new_keys):
+        if new_keys[j] < old_keys[i]:
+            keys.append(new_keys[j])
+            values.append(new_values[j])
+            j += 1
+        else:
+            keys.append(old_keys[i])
+            values.append(old_values[i])
+            i += 1
+    keys.extend(old_keys[i:])
+    values.extend(old_values[i:])
+    keys.extend(new_keys[j:])
+    values.extend(new_values[j:])
+
+
+class MovementTimeline:
+    """Lista de movimientos ordenada por fecha con búsqueda binaria"""
+    
+    def __init__(self):
+        self.movements: List[StockMovement] = []
+        self.timestamps: List[datetime] = []
+    
+    def __len__(self) -> int:
+        return len(self.movements)
+    
+    def insert(self, movement: StockMovement) -> None:
+        if not self.timestamps or movement.timestamp >= self.timestamps[-1]:
+            self.movements.append(movement)
+            self.timestamps.append(movement.timestamp)
+        else:
+            # Movimiento fuera de orden (p. ej. historial importado)
+            position = bisect_right(self.timestamps, movement.timestamp)
+            self.movements.insert(position, movement)
+            self.timestamps.insert(position, movement.timestamp)
+    
+    def extend(self, movements: List[StockMovement]) -> None:
+        """Agregar un lote; los lotes fuera de orden se fusionan en tiempo lineal"""
+        merge_sorted_run(self.timestamps, self.movements,
+                         [m.timestamp for m in movements], list(movements))
+    
+    def remove(self, movement: StockMovement) -> None:
+        position = bisect_left(self.timestamps, movement.timestamp)
+        while position < len(self.movements) and self.timestamps[position] == movement.timestamp:
+            if self.movements[position] is movement:
+                del self.movements[position]
+                del self.timestamps[position]
+                return
+            position += 1
+    
+    def view(self, start_date: Optional[datetime] = None,
+             end_date: Optional[datetime] = None) -> SequenceView:
+        """Movimientos entre dos fechas (inclusive) en O(log n)"""
+        if start_date is None and end_date is None:
+            return SequenceView(self.movements)
+        lo = 0 if start_date is None else bisect_left(self.timestamps, start_date)
+        hi = len(self.timestamps) if end_date is None else bisect_right(self.timestamps, end_date)
+        return SequenceView(self.movements, lo, max(lo, hi))
 
 
 class MovementRepository(Repository):
-    """Repositorio de movimientos con filtros avanzados"""
+    """Repositorio de movimientos ordenado por fecha con índices por producto y tipo"""
+    
+    def __init__(self):
+        self._timeline = MovementTimeline()
+        self._by_product: Dict[str, MovementTimeline] = {}
+        self._by_type: Dict[MovementType, MovementTimeline] = {t: MovementTimeline() for t in MovementType}
+        self._totals: Dict[MovementType, int] = {t: 0 for t in MovementType}
+        self._next_id = 1
+    
+    def _assign_id(self, movement: StockMovement) -> None:
+        if movement.movement_id is None:
+            movement.movement_id = self._next_id
+            self._next_id += 1
+        else:
+            self._next_id = max(self._next_id, movement.movement_id + 1)
+    
+    def _index(self, movement: StockMovement) -> None:
+        timeline = self._by_product.get(movement.product_code)
+        if timeline is None:
+            timeline = self._by_product[movement.product_code] = MovementTimeline()
+        timeline.insert(movement)
+        self._by_type[movement.movement_type].insert(movement)
+        self._totals[movement.movement_type] += movement.quantity
+    
+    def _unindex(self, movement: StockMovement) -> None:
+        timeline = self._by_product.get(movement.product_code)
+        if timeline is not None:
+            timeline.remove(movement)
+            if not timeline:
+                del self._by_product[movement.product_code]
+        self._by_type[movement.movement_type].remove(movement)
+        self._totals[movement.movement_type] -= movement.quantity
+    
+    def add(self, movement: StockMovement) -> None:
+        self._assign_id(movement)
+        self._timeline.insert(movement)
+        self._index(movement)
+    
+    def add_many(self, movements: List[StockMovement]) -> None:
+        """Agregar un lote de movimientos en una sola pasada"""
+        by_product: Dict[str, List[StockMovement]] = {}
+        by_type: Dict[MovementType, List[StockMovement]] = {}
+        for movement in movements:
+            self._assign_id(movement)
+            by_product.setdefault(movement.product_code, []).append(movement)
+            by_type.setdefault(movement.movement_type, []).append(movement)
+            self._totals[movement.movement_type] += movement.quantity
+        self._timeline.extend(movements)
+        for code, group in by_product.items():
+            timeline = self._by_product.get(code)
+            if timeline is None:
+                timeline = self._by_product[code] = MovementTimeline()
+            timeline.extend(group)
+        for movement_type, group in by_type.items():
+            self._by_type[movement_type].extend(group)
+    
+    def get(self, index: int) -> Optional[StockMovement]:
+        if 0 <= index < len(self._timeline):
+            return self._timeline.movements[index]
+        return None
+    
+    def get_all(self) -> List[StockMovement]:
+        return self._timeline.movements.copy()
+    
+    def get_all_view(self) -> Sequence:
+        """Todos los movimientos en orden cronológico (vista, sin copiar)"""
+        return SequenceView(self._timeline.movements)
+    
+    def update(self, index: int, movement: StockMovement) -> None:
+        if 0 <= index < len(self._timeline):
+            old = self._timeline.movements[index]
+            if movement.movement_id is None:
+                movement.movement_id = old.movement_id
+            self._unindex(old)
+            if movement.timestamp == old.timestamp:
+                self._timeline.movements[index] = movement
+            else:
+                # Cambió la fecha: reubicar para mantener el orden
+                self._timeline.remove(old)
+                self._timeline.insert(movement)
+            self._index(movement)
+    
+    def delete(self, index: int) -> None:
+        if 0 <= index < len(self._timeline):
+            movement = self._timeline.movements[index]
+            del self._timeline.movements[index]
+            del self._timeline.timestamps[index]
+            self._unindex(movement)
+    
+    def exists(self, index: int) -> bool:
+        return 0 <= index < len(self._timeline)
+    
+    def get_by_product(self, product_code: str, start_date: Optional[datetime] = None,
+                       end_date: Optional[datetime] = None) -> Sequence:
+        """Obtener movimientos de un producto específico (vista de solo lectura)"""
+        timeline = self._by_product.get(product_code)
+        if timeline is None:
+            return SequenceView([])
+        return timeline.view(start_date, end_date)
+    
+    def get_by_type(self, movement_type: MovementType, start_date: Optional[datetime] = None,
+                    end_date: Optional[datetime] = None) -> Sequence:
+        """Obtener movimientos por tipo (vista de solo lectura)"""
+        return self._by_type[movement_type].view(start_date, end_date)
+    
+    def get_by_date_range(self, start_date: datetime, end_date: datetime) -> Sequence:
+        """Obtener movimientos en un rango de fechas (vista de solo lectura)"""
+        return self._timeline.view(start_date, end_date)
+    
+    def get_total_quantity(self, movement_type: MovementType) -> int:
+        """Unidades acumuladas de un tipo de movimiento"""
+        return self._totals[movement_type]
+    
+    def get_totals_by_product(self, movement_type: MovementType) -> Dict[str, int]:
+        """Unidades acumuladas por producto para un tipo de movimiento"""
+        totals: Dict[str, int] = {}
+        for movement in self._by_type[movement_type].movements:
+            totals[movement.product_code] = totals.get(movement.product_code, 0) + movement.quantity
+        return totals
+
+
+class StringTable:
+    """Tabla de cadenas internadas (cadena <-> entero)"""
+    
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._values: List[str] = []
+    
+    def intern(self, value: str) -> int:
+        ident = self._ids.get(value)
+        if ident is None:
+            ident = self._ids[value] = len(self._values)
+            self._values.append(value)
+        return ident
+    
+    def lookup(self, value: str) -> Optional[int]:
+        return self._ids.get(value)
+    
+    def __getitem__(self, ident: int) -> str:
+        return self._values[ident]
+
+
+class RowTimeline:
+    """Índice de filas del almacén columnar ordenado por fecha (epoch en µs)"""
+    
+    def __init__(self):
+        self.timestamps = array('q')
+        self.rows = array('q')
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def insert(self, timestamp: int, row: int) -> None:
+        if not self.timestamps or timestamp >= self.timestamps[-1]:
+            self.timestamps.append(timestamp)
+            self.rows.append(row)
+        else:
+            position = bisect_right(self.timestamps, timestamp)
+            self.timestamps.insert(position, timestamp)
+            self.rows.insert(position, row)
+    
+    def extend(self, timestamps: List[int], rows: List[int]) -> None:
+        merge_sorted_run(self.timestamps, self.rows, timestamps, rows)
+    
+    def remove(self, timestamp: int, row: int) -> None:
+        position = bisect_left(self.timestamps, timestamp)
+        while position < len(self.rows) and self.timestamps[position] == timestamp:
+            if self.rows[position] == row:
+                del self.timestamps[position]
+                del self.rows[position]
+                return
+            position += 1
+    
+    def bounds(self, start: Optional[int], end: Optional[int]) -> tuple:
+        lo = 0 if start is None else bisect_left(self.timestamps, start)
+        hi = len(self.timestamps) if end is None else bisect_right(self.timestamps, end)
+        return lo, max(lo, hi)
+
+
+class RowView(SequenceView):
+    """Vista de filas que materializa StockMovement solo al acceder"""
+    
+    __slots__ = ('_materialize',)
+    
+    def __init__(self, rows: array, materialize: Callable[[int], StockMovement],
+                 start: int = 0, stop: Optional[int] = None):
+        super().__init__(rows, start, stop)
+        self._materialize = materialize
+    
+    def __getitem__(self, index):
+        positions = self._range()[index]
+        if isinstance(index, slice):
+            return [self._materialize(self._data[i]) for i in positions]
+        return self._materialize(self._data[positions])
+    
+    def __iter__(self):
+        rows, materialize = self._data, self._materialize
+        for i in self._range():
+            yield materialize(rows[i])
+
+
+class CompactMovementRepository(Repository):
+    """Repositorio columnar de movimientos para historiales muy grandes.
+    
+    Cada movimiento ocupa una fila en arreglos compactos: fecha como epoch
+    int64 en microsegundos, cantidad int32, tipo en un byte y código,
+    usuario y descripción como enteros de una tabla de cadenas internadas.
+    Los StockMovement se materializan solo al leerlos. Misma interfaz que
+    MovementRepository.
+    """
+    
+    _TYPES = tuple(MovementType)
     
     def __init__(self):
-        self._movements: List[StockMovement] = []
+        self._strings = StringTable()
+        self._ids = array('q')
+        self._timestamps = array('q')
+        self._quantities = array('i')
+        self._types = bytearray()
+        self._codes = array('i')
+        self._users = array('i')
+        self._descriptions = array('i')
+        
+        self._order = RowTimeline()
+        self._by_product: Dict[int, RowTimeline] = {}
+        self._by_type: Dict[MovementType, RowTimeline] = {t: RowTimeline() for t in MovementType}
+        self._totals: Dict[MovementType, int] = {t: 0 for t in MovementType}
+        self._next_id = 1
+    
+    def _materialize(self, row: int) -> StockMovement:
+        strings = self._strings
+        movement = StockMovement(
+            strings[self._codes[row]], self._quantities[row], self._TYPES[self._types[row]],
+            strings[self._descriptions[row]], strings[self._users[row]],
+            from_epoch_us(self._timestamps[row])
+        )
+        movement.movement_id = self._ids[row]
+        return movement
+    
+    def _window(self, timeline: RowTimeline, start_date: Optional[datetime],
+                end_date: Optional[datetime]) -> RowView:
+        if start_date is None and end_date is None:
+            return RowView(timeline.rows, self._materialize)
+        lo, hi = timeline.bounds(
+            None if start_date is None else to_epoch_us(start_date),
+            None if end_date is None else to_epoch_us(end_date)
+        )
+        return RowView(timeline.rows, self._materialize, lo, hi)
+    
+    def _append_row(self, movement: StockMovement) -> tuple:
+        """Escribir las columnas de un movimiento; devuelve (fila, epoch, código)"""
+        if movement.movement_id is None:
+            movement.movement_id = self._next_id
+        self._next_id = max(self._next_id, movement.movement_id + 1)
+        
+        row = len(self._ids)
+        timestamp = to_epoch_us(movement.timestamp)
+        code = self._strings.intern(movement.product_code)
+        self._ids.append(movement.movement_id)
+        self._timestamps.append(timestamp)
+        self._quantities.append(movement.quantity)
+        self._types.append(self._TYPES.index(movement.movement_type))
+        self._codes.append(code)
+        self._users.append(self._strings.intern(movement.user))
+        self._descriptions.append(self._strings.intern(movement.description))
+        self._totals[movement.movement_type] += movement.quantity
+        return row, timestamp, code
     
     def add(self, movement: StockMovement) -> None:
-        self._movements.append(movement)
+        row, timestamp, code = self._append_row(movement)
+        self._order.insert(timestamp, row)
+        timeline = self._by_product.get(code)
+        if timeline is None:
+            timeline = self._by_product[code] = RowTimeline()
+        timeline.insert(timestamp, row)
+        self._by_type[movement.movement_type].insert(timestamp, row)
+    
+    def add_many(self, movements: List[StockMovement]) -> None:
+        """Agregar un lote de movimientos en una sola pasada"""
+        timestamps: List[int] = []
+        rows: List[int] = []
+        by_product: Dict[int, tuple] = {}
+        by_type: Dict[MovementType, tuple] = {}
+        for movement in movements:
+            row, timestamp, code = self._append_row(movement)
+            timestamps.append(timestamp)
+            rows.append(row)
+            for groups, key in ((by_product, code), (by_type, movement.movement_type)):
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = ([], [])
+                group[0].append(timestamp)
+                group[1].append(row)
+        self._order.extend(timestamps, rows)
+        for code, (group_timestamps, group_rows) in by_product.items():
+            timeline = self._by_product.get(code)
+            if timeline is None:
+                timeline = self._by_product[code] = RowTimeline()
+            timeline.extend(group_timestamps, group_rows)
+        for movement_type, (group_timestamps, group_rows) in by_type.items():
+            self._by_type[movement_type].extend(group_timestamps, group_rows)
     
     def get(self, index: int) -> Optional[StockMovement]:
-        if 0 <= index < len(self._movements):
-            return self._movements[index]
+        if 0 <= index < len(self._order):
+            return self._materialize(self._order.rows[index])
         return None
     
     def get_all(self) -> List[StockMovement]:
-        return self._movements.copy()
+        return list(self.get_all_view())
+    
+    def get_all_view(self) -> Sequence:
+        """Todos los movimientos en orden cronológico (vista, sin copiar)"""
+        return RowView(self._order.rows, self._materialize)
     
     def update(self, index: int, movement: StockMovement) -> None:
-        if 0 <= index < len(self._movements):
-            self._movements[index] = movement
+        if 0 <= index < len(self._order):
+            if movement.movement_id is None:
+                movement.movement_id = self._ids[self._order.rows[index]]
+            self.delete(index)
+            self.add(movement)
     
     def delete(self, index: int) -> None:
-        if 0 <= index < len(self._movements):
-            del self._movements[index]
+        # La fila física queda en los arreglos pero deja de estar indexada
+        if 0 <= index < len(self._order):
+            row = self._order.rows[index]
+            timestamp = self._order.timestamps[index]
+            del self._order.rows[index]
+            del self._order.timestamps[index]
+            
+            movement_type = self._TYPES[self._types[row]]
+            code = self._codes[row]
+            timeline = self._by_product[code]
+            timeline.remove(timestamp, row)
+            if not timeline:
+                del self._by_product[code]
+            self._by_type[movement_type].remove(timestamp, row)
+            self._totals[movement_type] -= self._quantities[row]
     
     def exists(self, index: int) -> bool:
-        return 0 <= index < len(self._movements)
+        return 0 <= index < len(self._order)
+    
+    def get_by_product(self, product_code: str, start_date: Optional[datetime] = None,
+                       end_date: Optional[datetime] = None) -> Sequence:
+        """Obtener movimientos de un producto específico (vista de solo lectura)"""
+        code = self._strings.lookup(product_code)
+        timeline = self._by_product.get(code) if code is not None else None
+        if timeline is None:
+            return SequenceView([])
+        return self._window(timeline, start_date, end_date)
+    
+    def get_by_type(self, movement_type: MovementType, start_date: Optional[datetime] = None,
+                    end_date: Optional[datetime] = None) -> Sequence:
+        """Obtener movimientos por tipo (vista de solo lectura)"""
+        return self._window(self._by_type[movement_type], start_date, end_date)
+    
+    def get_by_date_range(self, start_date: datetime, end_date: datetime) -> Sequence:
+        """Obtener movimientos en un rango de fechas (vista de solo lectura)"""
+        return self._window(self._order, start_date, end_date)
+    
+    def get_total_quantity(self, movement_type: MovementType) -> int:
+        """Unidades acumuladas de un tipo de movimiento"""
+        return self._totals[movement_type]
+    
+    def get_totals_by_product(self, movement_type: MovementType) -> Dict[str, int]:
+        """Unidades acumuladas por producto para un tipo de movimiento"""
+        totals: Dict[int, int] = {}
+        for row in self._by_type[movement_type].rows:
+            code = self._codes[row]
+            totals[code] = totals.get(code, 0) + self._quantities[row]
+        return {self._strings[code]: quantity for code, quantity in totals.items()}
+
+
+def open_sqlite(database) -> sqlite3.Connection:
+    """Abrir (o reutilizar) una conexión SQLite configurada para el inventario"""
+    if isinstance(database, sqlite3.Connection):
+        return database
+    connection = sqlite3.connect(database, check_same_thread=False)
+    if database != ":memory:":
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class SQLiteProductRepository(Repository):
+    """Repositorio de productos persistido en SQLite.
+    
+    Las consultas se resuelven en SQL usando índices sobre código, barcode y
+    categoría; sqlite3 reutiliza las sentencias preparadas de su caché.
+    Código, nombre y descripción se guardan también en minúsculas calculadas
+    con ``str.lower``: lower() y LIKE de SQLite solo pliegan mayúsculas ASCII
+    y la búsqueda debe coincidir con la de ProductRepository (Á, Ñ, ...).
+    """
+    
+    persistent = True
+    _COLUMNS = "code, name, description, price, min_stock, category, barcode"
+    _SQL_INSERT = (f"INSERT INTO products ({_COLUMNS}, code_lower, name_lower, description_lower) "
+                   f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+    _SQL_GET = f"SELECT {_COLUMNS} FROM products WHERE code = ?"
+    _SQL_GET_BY_BARCODE = f"SELECT {_COLUMNS} FROM products WHERE barcode = ? AND barcode <> ''"
+    _SQL_EXISTS = "SELECT 1 FROM products WHERE code = ?"
+    _SQL_SEARCH = f"""
+        SELECT {_COLUMNS},
+               CASE WHEN code_lower = :query THEN 0
+                    WHEN code_lower LIKE :prefix ESCAPE '\\' THEN 1
+                    WHEN name_lower LIKE :prefix ESCAPE '\\' THEN 2
+                    WHEN code_lower LIKE :pattern ESCAPE '\\' THEN 3
+                    WHEN name_lower LIKE :pattern ESCAPE '\\' THEN 4
+                    ELSE 5 END AS rank
+        FROM products
+        WHERE code_lower LIKE :pattern ESCAPE '\\' OR name_lower LIKE :pattern ESCAPE '\\'
+              OR description_lower LIKE :pattern ESCAPE '\\'
+        ORDER BY rank, code_lower, code
+        LIMIT :limit
+    """
+    
+    def __init__(self, database="inventario.db"):
+        self._conn = open_sqlite(database)
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS products (
+                    code TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    price REAL NOT NULL,
+                    min_stock INTEGER NOT NULL,
+                    category TEXT NOT NULL,
+                    barcode TEXT NOT NULL DEFAULT '',
+                    code_lower TEXT NOT NULL,
+                    name_lower TEXT NOT NULL,
+                    description_lower TEXT NOT NULL
+                );
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_products_barcode
+                    ON products(barcode) WHERE barcode <> '';
+                CREATE INDEX IF NOT EXISTS idx_products_category ON products(category);
+            """)
+    
+    @staticmethod
+    def _to_product(row) -> Product:
+        return Product(*row[:7])
+    
+    @staticmethod
+    def _to_row(product: Product) -> tuple:
+        return (product.code, product.name, product.description, product.price,
+                product.min_stock, product.category, product.barcode,
+                product.code.lower(), product.name.lower(), product.description.lower())
+    
+    def _check_barcode(self, barcode: str, code: str) -> None:
+        owner = self.get_by_barcode(barcode) if barcode else None
+        if owner is not None and owner.code != code:
+            raise ValueError(f"El código de barras {barcode} ya está asignado al producto {owner.code}")
+    
+    def add(self, product: Product) -> None:
+        if self.exists(product.code):
+            raise ValueError(f"El producto {product.code} ya existe")
+        self._check_barcode(product.barcode, product.code)
+        with self._conn:
+            self._conn.execute(self._SQL_INSERT, self._to_row(product))
+    
+    def add_many(self, products: List[Product]) -> None:
+        """Insertar un lote de productos en una sola transacción (con las validaciones de ``add``)"""
+        codes: Set[str] = set()
+        barcodes: Dict[str, str] = {}
+        for product in products:
+            if product.code in codes or self.exists(product.code):
+                raise ValueError(f"El producto {product.code} ya existe")
+            codes.add(product.code)
+            if product.barcode:
+                owner = barcodes.get(product.barcode)
+                if owner is not None:
+                    raise ValueError(f"El código de barras {product.barcode} ya está asignado al producto {owner}")
+                self._check_barcode(product.barcode, product.code)
+                barcodes[product.barcode] = product.code
+        with self._conn:
+            self._conn.executemany(self._SQL_INSERT, [self._to_row(p) for p in products])
+    
+    def get(self, code: str) -> Optional[Product]:
+        row = self._conn.execute(self._SQL_GET, (code,)).fetchone()
+        return self._to_product(row) if row else None
+    
+    def get_by_barcode(self, barcode: str) -> Optional[Product]:
+        """Buscar producto por código de barras (índice único)"""
+        row = self._conn.execute(self._SQL_GET_BY_BARCODE, (barcode,)).fetchone()
+        return self._to_product(row) if row else None
+    
+    def get_all(self) -> List[Product]:
+        rows = self._conn.execute(f"SELECT {self._COLUMNS} FROM products")
+        return [self._to_product(row) for row in rows]
+    
+    def update(self, code: str, product: Product) -> None:
+        if not self.exists(code):
+            raise ValueError(f"El producto {code} no existe")
+        if product.code != code:
+            raise ValueError(f"No se puede cambiar el código del producto {code} a {product.code}")
+        self._check_barcode(product.barcode, code)
+        with self._conn:
+            self._conn.execute(
+                "UPDATE products SET code = ?, name = ?, description = ?, price = ?, "
+                "min_stock = ?, category = ?, barcode = ?, code_lower = ?, name_lower = ?, "
+                "description_lower = ? WHERE code = ?",
+                self._to_row(product) + (code,)
+            )
+    
+    def delete(self, code: str) -> None:
+        with self._conn:
+            self._conn.execute("DELETE FROM products WHERE code = ?", (code,))
+    
+    def exists(self, code: str) -> bool:
+        return self._conn.execute(self._SQL_EXISTS, (code,)).fetchone() is not None
+    
+    def search(self, query: str, limit: Optional[int] = None) -> List[Product]:
+        """Buscar productos por código, nombre o descripción, ordenados por relevancia"""
+        query_lower = query.strip().lower()
+        if not query_lower:
+            products = self.get_all()
+            return products[:limit] if limit is not None else products
+        
+        escaped = query_lower.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        rows = self._conn.execute(self._SQL_SEARCH, {
+            'query': query_lower,
+            'prefix': f"{escaped}%",
+            'pattern': f"%{escaped}%",
+            'limit': -1 if limit is None else limit
+        })
+        return [self._to_product(row) for row in rows]
+    
+    def get_by_category(self, category: str) -> List[Product]:
+        """Obtener productos por categoría"""
+        rows = self._conn.execute(f"SELECT {self._COLUMNS} FROM products WHERE category = ?", (category,))
+        return [self._to_product(row) for row in rows]
+    
+    def get_categories(self) -> List[str]:
+        """Obtener todas las categorías únicas"""
+        return [row[0] for row in self._conn.execute("SELECT DISTINCT category FROM products")]
+    
+    def get_category_count(self) -> int:
+        """Cantidad de categorías con al menos un producto"""
+        return self._conn.execute("SELECT COUNT(DISTINCT category) FROM products").fetchone()[0]
+
+
+class SQLiteQueryView(Sequence):
+    """Vista perezosa sobre una consulta de movimientos (paginada con LIMIT/OFFSET)"""
+    
+    def __init__(self, repo: 'SQLiteMovementRepository', where: str = "", params: tuple = ()):
+        self._repo = repo
+        self._where = f"WHERE {where}" if where else ""
+        self._params = params
+    
+    def __len__(self) -> int:
+        sql = f"SELECT COUNT(*) FROM movements {self._where}"
+        return self._repo._conn.execute(sql, self._params).fetchone()[0]
+    
+    def _fetch(self, offset: int, limit: int) -> List[StockMovement]:
+        sql = (f"SELECT {self._repo._COLUMNS} FROM movements {self._where} "
+               f"ORDER BY timestamp, id LIMIT ? OFFSET ?")
+        rows = self._repo._conn.execute(sql, self._params + (limit, offset))
+        return [self._repo._to_movement(row) for row in rows]
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            positions = range(len(self))[index]
+            if positions.step == 1:
+                return self._fetch(positions.start, len(positions)) if positions else []
+            return [self[i] for i in positions]
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("índice fuera de rango")
+        return self._fetch(index, 1)[0]
+    
+    def __iter__(self):
+        sql = f"SELECT {self._repo._COLUMNS} FROM movements {self._where} ORDER BY timestamp, id"
+        cursor = self._repo._conn.execute(sql, self._params)
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            for row in rows:
+                yield self._repo._to_movement(row)
+
+
+class SQLiteMovementRepository(Repository):
+    """Repositorio de movimientos persistido en SQLite.
+    
+    Los índices sobre fecha, producto y tipo permiten que los filtros se
+    resuelvan en SQL; las consultas devuelven vistas perezosas.
+    """
+    
+    persistent = True
+    _COLUMNS = "id, product_code, quantity, movement_type, description, user, timestamp"
+    _SQL_INSERT = ("INSERT INTO movements (id, product_code, quantity, movement_type, "
+                   "description, user, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)")
+    
+    def __init__(self, database="inventario.db"):
+        self._conn = open_sqlite(database)
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS movements (
+                    id INTEGER PRIMARY KEY,
+                    product_code TEXT NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    movement_type TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    user TEXT NOT NULL,
+                    timestamp INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_movements_timestamp ON movements(timestamp, id);
+                CREATE INDEX IF NOT EXISTS idx_movements_product ON movements(product_code, timestamp);
+                CREATE INDEX IF NOT EXISTS idx_movements_type ON movements(movement_type, timestamp);
+            """)
+    
+    @staticmethod
+    def _to_movement(row) -> StockMovement:
+        movement = StockMovement(row[1], row[2], MovementType(row[3]), row[4], row[5],
+                                 from_epoch_us(row[6]))
+        movement.movement_id = row[0]
+        return movement
+    
+    @staticmethod
+    def _to_row(movement: StockMovement) -> tuple:
+        return (movement.movement_id, movement.product_code, movement.quantity,
+                movement.movement_type.value, movement.description, movement.user,
+                to_epoch_us(movement.timestamp))
+    
+    @staticmethod
+    def _window(where: str, params: tuple, start_date: Optional[datetime],
+                end_date: Optional[datetime]) -> tuple:
+        conditions = [where] if where else []
+        if start_date is not None:
+            conditions.append("timestamp >= ?")
+            params += (to_epoch_us(start_date),)
+        if end_date is not None:
+            conditions.append("timestamp <= ?")
+            params += (to_epoch_us(end_date),)
+        return " AND ".join(conditions), params
+    
+    def _id_at(self, index: int) -> Optional[int]:
+        if index < 0:
+            return None
+        row = self._conn.execute(
+            "SELECT id FROM movements ORDER BY timestamp, id LIMIT 1 OFFSET ?", (index,)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def _insert(self, movements: List[StockMovement]) -> None:
+        with self._conn:
+            for movement in movements:
+                cursor = self._conn.execute(self._SQL_INSERT, self._to_row(movement))
+                movement.movement_id = cursor.lastrowid
+    
+    def add(self, movement: StockMovement) -> None:
+        self._insert([movement])
+    
+    def add_many(self, movements: List[StockMovement]) -> None:
+        """Agregar un lote de movimientos en una sola transacción"""
+        self._insert(movements)
+    
+    def get(self, index: int) -> Optional[StockMovement]:
+        movement_id = self._id_at(index)
+        if movement_id is None:
+            return None
+        row = self._conn.execute(f"SELECT {self._COLUMNS} FROM movements WHERE id = ?",
+                                 (movement_id,)).fetchone()
+        return self._to_movement(row)
+    
+    def get_all(self) -> List[StockMovement]:
+        return list(self.get_all_view())
+    
+    def get_all_view(self) -> Sequence:
+        """Todos los movimientos en orden cronológico (vista perezosa)"""
+        return SQLiteQueryView(self)
     
-    def get_by_product(self, product_code: str) -> List[StockMovement]:
-        """Obtener movimientos de un producto específico"""
-        return [m for m in self._movements if m.product_code == product_code]
+    def update(self, index: int, movement: StockMovement) -> None:
+        movement_id = self._id_at(index)
+        if movement_id is not None:
+            movement.movement_id = movement_id
+            row = self._to_row(movement)
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE movements SET product_code = ?, quantity = ?, movement_type = ?, "
+                    "description = ?, user = ?, timestamp = ? WHERE id = ?",
+                    row[1:] + (movement_id,)
+                )
     
-    def get_by_type(self, movement_type: MovementType) -> List[StockMovement]:
-        """Obtener movimientos por tipo"""
-        return [m for m in self._movements if m.movement_type == movement_type]
+    def delete(self, index: int) -> None:
+        movement_id = self._id_at(index)
+        if movement_id is not None:
+            with self._conn:
+                self._conn.execute("DELETE FROM movements WHERE id = ?", (movement_id,))
     
-    def get_by_date_range(self, start_date: datetime, end_date: datetime) -> List[StockMovement]:
-        """Obtener movimientos en un rango de fechas"""
-        return [m for m in self._movements 
-                if start_date <= m.timestamp <= end_date]
+    def exists(self, index: int) -> bool:
+        return self._id_at(index) is not None
+    
+    def get_by_product(self, product_code: str, start_date: Optional[datetime] = None,
+                       end_date: Optional[datetime] = None) -> Sequence:
+        """Obtener movimientos de un producto específico (vista perezosa)"""
+        return SQLiteQueryView(self, *self._window("product_code = ?", (product_code,),
+                                                   start_date, end_date))
+    
+    def get_by_type(self, movement_type: MovementType, start_date: Optional[datetime] = None,
+                    end_date: Optional[datetime] = None) -> Sequence:
+        """Obtener movimientos por tipo (vista perezosa)"""
+        return SQLiteQueryView(self, *self._window("movement_type = ?", (movement_type.value,),
+                                                   start_date, end_date))
+    
+    def get_by_date_range(self, start_date: datetime, end_date: datetime) -> Sequence:
+        """Obtener movimientos en un rango de fechas (vista perezosa)"""
+        return SQLiteQueryView(self, *self._window("", (), start_date, end_date))
+    
+    def get_total_quantity(self, movement_type: MovementType) -> int:
+        """Unidades acumuladas de un tipo de movimiento"""
+        row = self._conn.execute("SELECT COALESCE(SUM(quantity), 0) FROM movements WHERE movement_type = ?",
+                                 (movement_type.value,)).fetchone()
+        return row[0]
+    
+    def get_totals_by_product(self, movement_type: MovementType) -> Dict[str, int]:
+        """Unidades acumuladas por producto para un tipo de movimiento"""
+        rows = self._conn.execute(
+            "SELECT product_code, SUM(quantity) FROM movements WHERE movement_type = ? GROUP BY product_code",
+            (movement_type.value,)
+        )
+        return dict(rows)
 
 
 # ============= SERVICIOS DE NEGOCIO =============
 
-class InventoryService:
-    """Servicio principal de gestión de inventario"""
+@dataclass
+class InventoryChange:
+    """Evento de cambio del inventario con los productos afectados"""
+    product_codes: Set[str] = field(default_factory=set)
+    catalog_changed: bool = False  # productos nuevos (lista de productos y categorías)
+    movements_added: bool = False
+    alerts: List['AlertEvent'] = field(default_factory=list)  # cruces de umbral de stock
+    
+    def merge(self, other: 'InventoryChange') -> None:
+        """Acumular otro evento en este"""
+        self.product_codes |= other.product_codes
+        self.catalog_changed = self.catalog_changed or other.catalog_changed
+        self.movements_added = self.movements_added or other.movements_added
+        self.alerts.extend(other.alerts)
+
+
+@dataclass
+class AlertEvent:
+    """Cambio del nivel de alerta de un producto al cruzar un umbral"""
+    product_code: str
+    old_level: AlertLevel
+    new_level: AlertLevel
+    quantity: int
+    percentage: float
+    timestamp: datetime = field(default_factory=datetime.now)
+
+
+class SortedBuckets:
+    """Lista ordenada partida en cubetas de tamaño acotado.
+    
+    Insertar o quitar cuesta una búsqueda binaria sobre los máximos de cada
+    cubeta más un insort dentro de una cubeta de a lo sumo ``2 * load``
+    elementos, en lugar de desplazar toda la lista. Se recorre en orden (o en
+    orden inverso) en O(k) para los k primeros.
+    """
+    
+    def __init__(self, load: int = 512):
+        self._load = load
+        self._buckets: List[List] = []
+        self._maxes: List = []  # último elemento de cada cubeta
+        self._size = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def add(self, value) -> None:
+        if not self._buckets:
+            self._buckets.append([value])
+            self._maxes.append(value)
+        else:
+            index = bisect_left(self._maxes, value)
+            if index == len(self._maxes):
+                index -= 1
+                self._buckets[index].append(value)
+                self._maxes[index] = value
+            else:
+                insort(self._buckets[index], value)
+            bucket = self._buckets[index]
+            if len(bucket) > 2 * self._load:
+                upper = bucket[self._load:]
+                del bucket[self._load:]
+                self._buckets.insert(index + 1, upper)
+                self._maxes.insert(index + 1, upper[-1])
+                self._maxes[index] = bucket[-1]
+        self._size += 1
+    
+    def remove(self, value) -> None:
+        index = bisect_left(self._maxes, value)
+        if index < len(self._maxes):
+            bucket = self._buckets[index]
+            position = bisect_left(bucket, value)
+            if position < len(bucket) and bucket[position] == value:
+                del bucket[position]
+                self._size -= 1
+                if not bucket:
+                    del self._buckets[index]
+                    del self._maxes[index]
+                elif position == len(bucket):
+                    self._maxes[index] = bucket[-1]
+                return
+        raise ValueError(f"{value!r} no está en la lista")
+    
+    def __iter__(self) -> Iterator:
+        for bucket in self._buckets:
+            yield from bucket
+    
+    def __reversed__(self) -> Iterator:
+        for bucket in reversed(self._buckets):
+            yield from reversed(bucket)
+    
+    def first(self, count: int) -> List:
+        result = []
+        for bucket in self._buckets:
+            if len(result) >= count:
+                break
+            result.extend(bucket[:count - len(result)])
+        return result
+
+
+class SalesRanking:
+    """Ranking ordenado de unidades vendidas por producto (top-k en O(k))"""
+    
+    def __init__(self):
+        self._totals: Dict[str, int] = {}
+        self._ordered = SortedBuckets()  # (unidades, código) ordenado ascendente
+    
+    def __len__(self) -> int:
+        return len(self._ordered)
+    
+    def get(self, code: str) -> int:
+        return self._totals.get(code, 0)
+    
+    def track(self, code: str) -> None:
+        """Registrar un producto con 0 ventas si aún no existe"""
+        if code not in self._totals:
+            self._totals[code] = 0
+            self._ordered.add((0, code))
+    
+    def add(self, code: str, quantity: int) -> None:
+        """Sumar unidades vendidas a un producto"""
+        self.track(code)
+        old = self._totals[code]
+        self._ordered.remove((old, code))
+        self._totals[code] = old + quantity
+        self._ordered.add((old + quantity, code))
+    
+    def most_sold(self, limit: int) -> List[tuple]:
+        result = []
+        for quantity, code in reversed(self._ordered):
+            if len(result) >= limit or quantity <= 0:
+                break
+            result.append((code, quantity))
+        return result
+    
+    def least_sold(self, limit: int) -> List[tuple]:
+        return [(code, quantity) for quantity, code in self._ordered.first(limit)]
+
+
+class StockAlertIndex:
+    """Nivel de alerta por producto e índice ordenado por porcentaje de stock.
+    
+    Se actualiza con cada cambio de cantidad y solo genera un AlertEvent
+    cuando el nivel cambia. Los productos más críticos están al principio de
+    las cubetas ordenadas, así que los k primeros se obtienen en O(k).
+    """
+    
+    def __init__(self):
+        self._entries: Dict[str, tuple] = {}  # código -> (porcentaje, código, nivel, item)
+        self._ordered = SortedBuckets()       # (porcentaje, código) ascendente
+        self._counts: Dict[AlertLevel, int] = {level: 0 for level in AlertLevel}
+    
+    def __len__(self) -> int:
+        return len(self._ordered)
+    
+    def level(self, code: str) -> Optional[AlertLevel]:
+        entry = self._entries.get(code)
+        return entry[2] if entry is not None else None
+    
+    def count(self, level: AlertLevel) -> int:
+        return self._counts[level]
+    
+    def update(self, item: InventoryItem) -> Optional[AlertEvent]:
+        """Reindexar un item tras un cambio; devuelve el evento si cruzó un umbral"""
+        code = item.product.code
+        percentage, level = item.get_stock_percentage(), item.get_alert_level()
+        old = self._entries.get(code)
+        if old is not None:
+            if old[0] != percentage:
+                self._ordered.remove((old[0], code))
+                self._ordered.add((percentage, code))
+            self._counts[old[2]] -= 1
+        else:
+            self._ordered.add((percentage, code))
+        self._counts[level] += 1
+        self._entries[code] = (percentage, code, level, item)
+        
+        if old is not None and old[2] != level:
+            return AlertEvent(code, old[2], level, item.quantity, percentage)
+        return None
     
-    def __init__(self, product_repo: ProductRepository, movement_repo: MovementRepository):
+    def most_critical(self, limit: Optional[int] = None,
+                      min_level: AlertLevel = AlertLevel.LOW) -> List[InventoryItem]:
+        """Items en alerta (nivel >= ``min_level``) de menor a mayor porcentaje"""
+        accepted = (AlertLevel.CRITICAL,) if min_level == AlertLevel.CRITICAL else \
+            (AlertLevel.LOW, AlertLevel.CRITICAL) if min_level == AlertLevel.LOW else tuple(AlertLevel)
+        result = []
+        for _, code in self._ordered:
+            if limit is not None and len(result) >= limit:
+                break
+            _, _, level, item = self._entries[code]
+            if level not in accepted:
+                break  # el resto tiene más stock relativo
+            result.append(item)
+        return result
+
+
+class LockStriping:
+    """Conjunto fijo de locks repartidos por hash de la clave.
+    
+    Varias claves pueden compartir lock; los grupos se adquieren siempre en
+    orden de índice para evitar interbloqueos.
+    """
+    
+    def __init__(self, stripes: int = 64):
+        if stripes <= 0:
+            raise ValueError("El número de locks debe ser positivo")
+        self._locks = [threading.Lock() for _ in range(stripes)]
+    
+    def _index(self, key: str) -> int:
+        return hash(key) % len(self._locks)
+    
+    def lock_for(self, key: str) -> threading.Lock:
+        return self._locks[self._index(key)]
+    
+    @contextmanager
+    def hold(self, keys: Optional[Iterable[str]] = None):
+        """Adquirir los locks de las claves indicadas (todos si es None)"""
+        indexes = range(len(self._locks)) if keys is None else sorted({self._index(key) for key in keys})
+        with ExitStack() as stack:
+            for index in indexes:
+                stack.enter_context(self._locks[index])
+            yield
+
+
+class InventoryService:
+    """Servicio principal de gestión de inventario.
+    
+    Seguro para varios hilos escritores (scanners, terminales):
+    - los cambios de stock toman el lock de su producto (LockStriping);
+    - las altas de productos toman además un lock global de catálogo;
+    - agregados, ranking, repositorio de movimientos y journal se actualizan
+      en una sección breve protegida por ``_shared_lock``.
+    Orden de adquisición: catálogo -> productos -> compartido.
+    Las estadísticas se leen de una tupla inmutable publicada tras cada cambio,
+    sin bloquear a los escritores.
+    
+    El estado se recupera de una de dos fuentes: repositorios que ya persisten
+    sus datos (SQLite) o un InventoryJournal sobre repositorios en memoria
+    vacíos. Combinar ambos duplicaría el estado y no está permitido.
+    """
+    
+    def __init__(self, product_repo: ProductRepository, movement_repo: MovementRepository,
+                 journal: Optional['InventoryJournal'] = None, lock_stripes: int = 64):
+        if journal is not None:
+            if product_repo.persistent or movement_repo.persistent:
+                raise ValueError("El journal solo se usa con repositorios en memoria; "
+                                 "los repositorios SQLite ya persisten el inventario")
+            if product_repo.get_all() or movement_repo.get_all_view():
+                raise ValueError("El journal debe restaurarse sobre repositorios vacíos")
         self._product_repo = product_repo
         self._movement_repo = movement_repo
+        self._journal = journal
         self._inventory: Dict[str, InventoryItem] = {}
         self._observers: List[Callable] = []
-    
-    def add_observer(self, observer: Callable) -> None:
+        self._sales = SalesRanking()
+        # Unidades por tipo de movimiento desde el inicio del inventario; con un
+        # journal sobreviven al snapshot aunque el historial anterior no se recargue
+        self._movement_totals: Dict[MovementType, int] = {t: 0 for t in MovementType}
+        # Versión del estado: crece con cada mutación (invalida cachés de reportes)
+        self._version = 0
+        
+        self._catalog_lock = threading.Lock()
+        self._item_locks = LockStriping(lock_stripes)
+        self._shared_lock = threading.RLock()
+        
+        # Agregados mantenidos incrementalmente para estadísticas O(1)
+        self._total_items = 0
+        self._total_value = 0.0
+        self._alerts = StockAlertIndex()
+        self._stats = (0, 0, 0.0, 0, 0)
+        
+        # Reservas abiertas y montículo de vencimientos (fecha µs, id).
+        # Las entradas de reservas ya cerradas se descartan al salir del montículo.
+        self._reservations: Dict[str, Reservation] = {}
+        self._expiry_heap: List[tuple] = []
+        self._next_reservation = 1
+        
+        if journal is not None:
+            self._publish_stats()
+            journal.restore(self)
+        else:
+            self._load_existing()
+            self._publish_stats()
+    
+    def _load_existing(self) -> None:
+        """Reconstruir el inventario a partir de repositorios ya poblados (p. ej. SQLite)"""
+        entries = self._movement_repo.get_totals_by_product(MovementType.ENTRY)
+        exits = self._movement_repo.get_totals_by_product(MovementType.EXIT)
+        for code, quantity in exits.items():
+            self._sales.add(code, quantity)
+        for movement_type in MovementType:
+            self._movement_totals[movement_type] = self._movement_repo.get_total_quantity(movement_type)
+        for product in self._product_repo.get_all():
+            quantity = entries.get(product.code, 0) - exits.get(product.code, 0)
+            item = InventoryItem(product, quantity)
+            self._inventory[product.code] = item
+            self._sales.track(product.code)
+            self._track_item(item, 0)
+    
+    def load_snapshot(self, entries: List[tuple],
+                      movement_totals: Optional[Dict[MovementType, int]] = None) -> None:
+        """Cargar estado (producto, cantidad, vendido, reservas) y totales por tipo desde un snapshot"""
+        codes = set()
+        with self._catalog_lock, self._shared_lock:
+            if movement_totals:
+                self._movement_totals.update(movement_totals)
+            for product, quantity, sold, reservations in entries:
+                if not self._product_repo.exists(product.code):
+                    self._product_repo.add(product)
+                item = InventoryItem(product, quantity)
+                for reservation in reservations:
+                    item.add_reservation(reservation)
+                    self._index_reservation(reservation)
+                self._inventory[product.code] = item
+                self._sales.track(product.code)
+                if sold:
+                    self._sales.add(product.code, sold)
+                self._track_item(item, 0)
+                codes.add(product.code)
+            self._publish_stats()
+        self._notify_observers(InventoryChange(codes, catalog_changed=bool(codes)))
+    
+    @contextmanager
+    def _exclusive(self):
+        """Detener todos los escritores (para snapshots consistentes)"""
+        with self._catalog_lock, self._item_locks.hold(), self._shared_lock:
+            yield
+    
+    def _journal_write(self, products: List[Product] = (), movements: List[StockMovement] = (),
+                       reservations: List[Reservation] = (), released: List[str] = ()) -> None:
+        """Encolar cambios en el journal (si hay uno configurado); requiere ``_shared_lock``"""
+        if self._journal is not None:
+            self._journal.append(products, movements, reservations, released)
+    
+    def _journal_checkpoint(self) -> None:
+        """Escribir a disco lo encolado y un snapshot si toca; se llama sin locks tomados"""
+        if self._journal is None:
+            return
+        self._journal.flush()
+        if self._journal.snapshot_due:
+            with self._exclusive():
+                self._journal.checkpoint(self)
+    
+    def _count_movements(self, movements: Iterable[StockMovement]) -> None:
+        """Acumular los totales por tipo; requiere ``_shared_lock``"""
+        for movement in movements:
+            self._movement_totals[movement.movement_type] += movement.quantity
+    
+    def _publish_stats(self) -> None:
+        """Publicar una copia consistente de los agregados; requiere ``_shared_lock``"""
+        critical = self._alerts.count(AlertLevel.CRITICAL)
+        self._stats = (len(self._inventory), self._total_items, self._total_value,
+                       self._alerts.count(AlertLevel.LOW) + critical, critical)
+    
+    def _track_item(self, item: InventoryItem, old_quantity: int) -> Optional[AlertEvent]:
+        """Actualizar agregados e índice de alertas tras un cambio de cantidad de un item"""
+        delta = item.quantity - old_quantity
+        self._total_items += delta
+        self._total_value += delta * item.product.price
+        return self._alerts.update(item)
+    
+    def add_observer(self, observer: Callable[[InventoryChange], None]) -> None:
         """Añadir observador para cambios en el inventario"""
         self._observers.append(observer)
     
-    def _notify_observers(self) -> None:
-        """Notificar a todos los observadores"""
+    @property
+    def version(self) -> int:
+        """Versión del estado del inventario; cambia con cada mutación"""
+        return self._version
+    
+    def _notify_observers(self, change: InventoryChange) -> None:
+        """Incrementar la versión y notificar a todos los observadores"""
+        with self._shared_lock:
+            self._version += 1
+        self._journal_checkpoint()
         for observer in self._observers:
-            observer()
+            observer(change)
     
     def register_product(self, product: Product, initial_quantity: int = 0, user: str = "Sistema") -> None:
         """Registrar un nuevo producto"""
-        if self._product_repo.exists(product.code):
-            raise ValueError(f"El producto {product.code} ya existe")
-        
-        self._product_repo.add(product)
-        self._inventory[product.code] = InventoryItem(product, initial_quantity)
-        
-        if initial_quantity > 0:
-            movement = StockMovement(
-                product.code, initial_quantity, 
-                MovementType.ENTRY, "Stock inicial", user
-            )
-            self._movement_repo.add(movement)
-        
-        self._notify_observers()
+        with self._catalog_lock:
+            if self._product_repo.exists(product.code):
+                raise ValueError(f"El producto {product.code} ya existe")
+            
+            self._product_repo.add(product)
+            item = InventoryItem(product, initial_quantity)
+            
+            movements = []
+            if initial_quantity > 0:
+                movements.append(StockMovement(
+                    product.code, initial_quantity, 
+                    MovementType.ENTRY, "Stock inicial", user
+                ))
+            
+            with self._shared_lock:
+                self._inventory[product.code] = item
+                self._sales.track(product.code)
+                self._track_item(item, 0)
+                self._movement_repo.add_many(movements)
+                self._count_movements(movements)
+                self._journal_write([product], movements)
+                self._publish_stats()
+        self._notify_observers(InventoryChange({product.code}, catalog_changed=True,
+                                               movements_added=initial_quantity > 0))
+    
+    def _get_item(self, product_code: str) -> InventoryItem:
+        item = self._inventory.get(product_code)
+        if item is None:
+            raise ValueError(f"Producto {product_code} no encontrado")
+        return item
     
     def add_stock(self, product_code: str, quantity: int, description: str = "", user: str = "Sistema") -> None:
         """Agregar stock a un producto"""
-        if product_code not in self._inventory:
-            raise ValueError(f"Producto {product_code} no encontrado")
-        
-        self._inventory[product_code].add_stock(quantity)
-        movement = StockMovement(product_code, quantity, MovementType.ENTRY, description, user)
-        self._movement_repo.add(movement)
-        self._notify_observers()
+        item = self._get_item(product_code)
+        with self._item_locks.lock_for(product_code):
+            old_quantity = item.quantity
+            item.add_stock(quantity)
+            movement = StockMovement(product_code, quantity, MovementType.ENTRY, description, user)
+            with self._shared_lock:
+                alert = self._track_item(item, old_quantity)
+                self._movement_repo.add(movement)
+                self._count_movements([movement])
+                self._journal_write(movements=[movement])
+                self._publish_stats()
+        self._notify_observers(InventoryChange({product_code}, movements_added=True,
+                                               alerts=[alert] if alert else []))
     
     def remove_stock(self, product_code: str, quantity: int, description: str = "", user: str = "Sistema") -> None:
         """Remover stock de un producto"""
-        if product_code not in self._inventory:
-            raise ValueError(f"Producto {product_code} no encontrado")
-        
-        self._inventory[product_code].remove_stock(quantity)
-        movement = StockMovement(product_code, quantity, MovementType.EXIT, description, user)
-        self._movement_repo.add(movement)
-        self._notify_observers()
-    
-    def reserve_stock(self, product_code: str, quantity: int) -> None:
-        """Reservar stock para pedidos"""
-        if product_code not in self._inventory:
-            raise ValueError(f"Producto {product_code} no encontrado")
-        
-        self._inventory[product_code].reserve_stock(quantity)
-        self._notify_observers()
+        item = self._get_item(product_code)
+        with self._item_locks.lock_for(product_code):
+            old_quantity = item.quantity
+            item.remove_stock(quantity)
+            movement = StockMovement(product_code, quantity, MovementType.EXIT, description, user)
+            with self._shared_lock:
+                alert = self._track_item(item, old_quantity)
+                self._movement_repo.add(movement)
+                self._count_movements([movement])
+                self._sales.add(product_code, quantity)
+                self._journal_write(movements=[movement])
+                self._publish_stats()
+        self._notify_observers(InventoryChange({product_code}, movements_added=True,
+                                               alerts=[alert] if alert else []))
+    
+    def reserve_stock(self, product_code: str, quantity: int, owner: str = "Sistema",
+                      ttl: Optional[timedelta] = None) -> Reservation:
+        """Reservar stock para un pedido; con ``ttl`` la reserva vence sola"""
+        if ttl is not None and ttl <= timedelta(0):
+            raise ValueError("La duración de la reserva debe ser positiva")
+        item = self._get_item(product_code)
+        with self._item_locks.lock_for(product_code):
+            with self._shared_lock:
+                reservation_id = f"RES-{self._next_reservation:06d}"
+                self._next_reservation += 1
+            now = datetime.now()
+            reservation = Reservation(reservation_id, product_code, quantity, owner, now,
+                                      now + ttl if ttl is not None else None)
+            item.add_reservation(reservation)
+            with self._shared_lock:
+                self._index_reservation(reservation)
+                self._journal_write(reservations=[reservation])
+        self._notify_observers(InventoryChange({product_code}))
+        return reservation
+    
+    def _index_reservation(self, reservation: Reservation) -> None:
+        """Registrar una reserva abierta; requiere ``_shared_lock``"""
+        self._reservations[reservation.reservation_id] = reservation
+        if reservation.expires_at is not None:
+            heapq.heappush(self._expiry_heap, (to_epoch_us(reservation.expires_at), reservation.reservation_id))
+        number = reservation.reservation_id.rpartition('-')[2]
+        if number.isdigit():
+            self._next_reservation = max(self._next_reservation, int(number) + 1)
+    
+    def _unindex_reservation(self, reservation_id: str) -> None:
+        """Quitar una reserva cerrada; requiere ``_shared_lock``.
+        
+        Su entrada del montículo queda obsoleta; si las obsoletas superan a
+        las vigentes se reconstruye el montículo (coste amortizado O(1)).
+        """
+        del self._reservations[reservation_id]
+        if len(self._expiry_heap) > 2 * len(self._reservations) + 64:
+            self._expiry_heap = [entry for entry in self._expiry_heap if entry[1] in self._reservations]
+            heapq.heapify(self._expiry_heap)
+    
+    def _open_reservation(self, reservation_id: str) -> tuple:
+        reservation = self._reservations.get(reservation_id)
+        if reservation is None:
+            raise ValueError(f"Reserva {reservation_id} no encontrada")
+        return reservation, self._get_item(reservation.product_code)
+    
+    def restore_reservation(self, reservation: Reservation) -> None:
+        """Volver a abrir una reserva registrada en el journal"""
+        item = self._get_item(reservation.product_code)
+        with self._item_locks.lock_for(reservation.product_code):
+            item.add_reservation(reservation)
+            with self._shared_lock:
+                self._index_reservation(reservation)
+        self._notify_observers(InventoryChange({reservation.product_code}))
+    
+    def release_reservation(self, reservation_id: str) -> Reservation:
+        """Cancelar una reserva y devolver el stock a disponible"""
+        reservation, item = self._open_reservation(reservation_id)
+        with self._item_locks.lock_for(reservation.product_code):
+            item.release_reservation(reservation_id)  # falla si otro hilo ya la cerró
+            with self._shared_lock:
+                self._unindex_reservation(reservation_id)
+                self._journal_write(released=[reservation_id])
+        self._notify_observers(InventoryChange({reservation.product_code}))
+        return reservation
+    
+    def commit_reservation(self, reservation_id: str, description: str = "",
+                           user: Optional[str] = None) -> StockMovement:
+        """Confirmar una reserva: se registra como salida (venta) del stock reservado"""
+        reservation, item = self._open_reservation(reservation_id)
+        code = reservation.product_code
+        with self._item_locks.lock_for(code):
+            old_quantity = item.quantity
+            item.commit_reservation(reservation_id)
+            movement = StockMovement(code, reservation.quantity, MovementType.EXIT,
+                                     description or f"Reserva {reservation_id}", user or reservation.owner)
+            with self._shared_lock:
+                self._unindex_reservation(reservation_id)
+                alert = self._track_item(item, old_quantity)
+                self._movement_repo.add(movement)
+                self._count_movements([movement])
+                self._sales.add(code, reservation.quantity)
+                self._journal_write(movements=[movement], released=[reservation_id])
+                self._publish_stats()
+        self._notify_observers(InventoryChange({code}, movements_added=True,
+                                               alerts=[alert] if alert else []))
+        return movement
+    
+    def expire_reservations(self, now: Optional[datetime] = None) -> List[Reservation]:
+        """Liberar las reservas vencidas; el coste depende solo de las vencidas"""
+        limit = to_epoch_us(now or datetime.now())
+        due = []
+        with self._shared_lock:
+            heap = self._expiry_heap
+            while heap and heap[0][0] <= limit:
+                _, reservation_id = heapq.heappop(heap)
+                if reservation_id in self._reservations:
+                    due.append(reservation_id)
+        expired = []
+        for reservation_id in due:
+            try:
+                expired.append(self.release_reservation(reservation_id))
+            except ValueError:
+                pass  # confirmada o liberada mientras tanto
+        return expired
+    
+    def get_reservation(self, reservation_id: str) -> Optional[Reservation]:
+        return self._reservations.get(reservation_id)
+    
+    def get_reservations(self, product_code: Optional[str] = None) -> List[Reservation]:
+        """Reservas abiertas (de un producto o todas)"""
+        if product_code is not None:
+            item = self._inventory.get(product_code)
+            return item.reservations if item is not None else []
+        return list(self._reservations.values())
+    
+    def register_products(self, entries: List[tuple], user: str = "Sistema",
+                          timestamp: Optional[datetime] = None) -> None:
+        """Registrar un lote de (producto, cantidad inicial) de forma atómica.
+        
+        timestamp permite fechar el "Stock inicial" (p. ej. al importar un historial).
+        """
+        with self._catalog_lock:
+            codes = set()
+            barcodes = set()
+            for product, initial_quantity in entries:
+                if product.code in codes or self._product_repo.exists(product.code):
+                    raise ValueError(f"El producto {product.code} ya existe")
+                if product.barcode and (product.barcode in barcodes or
+                                        self._product_repo.get_by_barcode(product.barcode)):
+                    raise ValueError(f"El código de barras {product.barcode} ya está asignado")
+                if initial_quantity < 0:
+                    raise ValueError(f"Cantidad inicial inválida para {product.code}")
+                codes.add(product.code)
+                if product.barcode:
+                    barcodes.add(product.barcode)
+            
+            self._product_repo.add_many([product for product, _ in entries])
+            items = [InventoryItem(product, initial_quantity) for product, initial_quantity in entries]
+            movements = [
+                StockMovement(product.code, initial_quantity, MovementType.ENTRY, "Stock inicial", user, timestamp)
+                for product, initial_quantity in entries if initial_quantity > 0
+            ]
+            
+            with self._shared_lock:
+                for item in items:
+                    self._inventory[item.product.code] = item
+                    self._sales.track(item.product.code)
+                    self._track_item(item, 0)
+                self._movement_repo.add_many(movements)
+                self._count_movements(movements)
+                self._journal_write([product for product, _ in entries], movements)
+                self._publish_stats()
+        self._notify_observers(InventoryChange(codes, catalog_changed=bool(codes),
+                                               movements_added=bool(movements)))
+    
+    def _validate_movements(self, movements: List[StockMovement]) -> None:
+        """Validar un lote completo simulando el stock disponible"""
+        available: Dict[str, int] = {}
+        for position, movement in enumerate(movements, 1):
+            code = movement.product_code
+            item = self._inventory.get(code)
+            if item is None:
+                raise ValueError(f"Movimiento {position}: producto {code} no encontrado")
+            if movement.quantity <= 0:
+                raise ValueError(f"Movimiento {position}: la cantidad debe ser positiva")
+            current = available.get(code, item.available_quantity)
+            if movement.movement_type == MovementType.EXIT:
+                if movement.quantity > current:
+                    raise ValueError(f"Movimiento {position}: stock insuficiente para {code}. Disponible: {current}")
+                current -= movement.quantity
+            else:
+                current += movement.quantity
+            available[code] = current
+    
+    def apply_movements(self, movements: List[StockMovement]) -> None:
+        """Aplicar un lote de movimientos de forma atómica (todo o nada)"""
+        codes = {m.product_code for m in movements}
+        with self._item_locks.hold(codes):
+            self._validate_movements(movements)
+            
+            before: Dict[str, tuple] = {}  # estado previo de cada item para los agregados
+            sold: Dict[str, int] = {}
+            for movement in movements:
+                item = self._inventory[movement.product_code]
+                if movement.product_code not in before:
+                    before[movement.product_code] = (item, item.quantity)
+                if movement.movement_type == MovementType.ENTRY:
+                    item.add_stock(movement.quantity)
+                else:
+                    item.remove_stock(movement.quantity)
+                    sold[movement.product_code] = sold.get(movement.product_code, 0) + movement.quantity
+            
+            with self._shared_lock:
+                alerts = [self._track_item(item, old_quantity) for item, old_quantity in before.values()]
+                # Una sola actualización del ranking por producto
+                for code, quantity in sold.items():
+                    self._sales.add(code, quantity)
+                self._movement_repo.add_many(movements)
+                self._count_movements(movements)
+                self._journal_write(movements=movements)
+                self._publish_stats()
+        self._notify_observers(InventoryChange(codes, movements_added=bool(movements),
+                                               alerts=[alert for alert in alerts if alert]))
     
     def get_inventory_item(self, product_code: str) -> Optional[InventoryItem]:
         """Obtener item de inventario"""
@@ -369,71 +2075,364 @@ class InventoryService:
         return list(self._inventory.values())
     
     def get_low_stock_items(self) -> List[InventoryItem]:
-        """Obtener productos con stock bajo"""
-        return [item for item in self._inventory.values() 
-                if item.get_alert_level() != AlertLevel.NORMAL]
+        """Obtener productos con stock bajo (incluye críticos), del más crítico al menos"""
+        with self._shared_lock:
+            return self._alerts.most_critical()
     
     def get_critical_stock_items(self) -> List[InventoryItem]:
-        """Obtener productos con stock crítico"""
-        return [item for item in self._inventory.values() 
-                if item.get_alert_level() == AlertLevel.CRITICAL]
+        """Obtener productos con stock crítico, del más crítico al menos"""
+        with self._shared_lock:
+            return self._alerts.most_critical(min_level=AlertLevel.CRITICAL)
+    
+    def get_most_critical_items(self, limit: int = 50) -> List[InventoryItem]:
+        """Los ``limit`` productos en alerta con menor porcentaje de stock (O(k))"""
+        with self._shared_lock:
+            return self._alerts.most_critical(limit)
+    
+    def get_alert_level(self, product_code: str) -> Optional[AlertLevel]:
+        """Nivel de alerta vigente de un producto sin recalcularlo"""
+        return self._alerts.level(product_code)
     
     def get_total_inventory_value(self) -> float:
-        """Calcular valor total del inventario"""
-        return sum(item.quantity * item.product.price 
-                   for item in self._inventory.values())
+        """Valor total del inventario"""
+        return self._stats[2]
     
     def get_inventory_statistics(self) -> Dict:
-        """Obtener estadísticas del inventario"""
-        items = list(self._inventory.values())
+        """Obtener estadísticas del inventario en tiempo constante (sin bloquear)"""
+        total_products, total_items, total_value, low_count, critical_count = self._stats
         return {
-            'total_products': len(items),
-            'total_items': sum(item.quantity for item in items),
-            'total_value': self.get_total_inventory_value(),
-            'low_stock_count': len(self.get_low_stock_items()),
-            'critical_stock_count': len(self.get_critical_stock_items()),
-            'categories': len(self._product_repo.get_categories())
+            'total_products': total_products,
+            'total_items': total_items,
+            'total_value': total_value,
+            'low_stock_count': low_count,
+            'critical_stock_count': critical_count,
+            'categories': self._product_repo.get_category_count()
         }
     
+    def get_movement_total(self, movement_type: MovementType) -> int:
+        """Unidades movidas de un tipo desde el inicio, incluido el historial previo a un snapshot"""
+        return self._movement_totals[movement_type]
+    
+    def get_movement_totals(self) -> Dict[MovementType, int]:
+        with self._shared_lock:
+            return dict(self._movement_totals)
+    
+    def get_units_sold(self, product_code: str) -> int:
+        """Unidades vendidas de un producto"""
+        return self._sales.get(product_code)
+    
     def get_most_sold_products(self, limit: int = 10) -> List[tuple]:
         """Obtener productos más vendidos"""
-        exits = self._movement_repo.get_by_type(MovementType.EXIT)
-        sales_counter = Counter()
-        
-        for movement in exits:
-            sales_counter[movement.product_code] += movement.quantity
-        
-        return sales_counter.most_common(limit)
+        with self._shared_lock:
+            return self._sales.most_sold(limit)
     
     def get_least_sold_products(self, limit: int = 10) -> List[tuple]:
-        """Obtener productos menos vendidos"""
-        exits = self._movement_repo.get_by_type(MovementType.EXIT)
-        sales_counter = Counter()
-        
-        # Incluir todos los productos
-        for item in self._inventory.values():
-            sales_counter[item.product.code] = 0
-        
-        for movement in exits:
-            sales_counter[movement.product_code] += movement.quantity
-        
-        # Ordenar de menor a mayor
-        return sorted(sales_counter.items(), key=lambda x: x[1])[:limit]
+        """Obtener productos menos vendidos (incluye productos sin ventas)"""
+        with self._shared_lock:
+            return self._sales.least_sold(limit)
+
+
+# ============= PERSISTENCIA =============
+
+class InventoryJournal:
+    """Log binario de solo-anexado con snapshots periódicos del inventario.
+    
+    Cada cambio se anexa a ``journal.log`` como un registro compacto; cada
+    ``snapshot_every`` registros se escribe ``snapshot.json`` con las
+    cantidades, reservas y ventas por producto junto con la posición del log.
+    Al iniciar se carga el último snapshot y solo se reproduce el log
+    posterior, por lo que el tiempo de arranque no crece con el historial.
+    Los movimientos anteriores al snapshot no se recargan en el repositorio:
+    sus efectos (stock, ventas y totales por tipo) vienen en el snapshot, y
+    las consultas de historial solo ven los movimientos posteriores.
+    
+    Política de fsync: 'always' (cada escritura), 'batch' (cada
+    ``fsync_every`` registros) o 'never' (lo decide el sistema operativo).
+    
+    ``append`` solo codifica y encola los registros en memoria (se llama con
+    los locks del servicio tomados); ``flush`` los escribe y aplica la
+    política de fsync fuera de esos locks, agrupando los de varios hilos.
+    """
+    
+    PRODUCT, ENTRY, EXIT, RESERVATION, RELEASE = range(5)
+    # tipo, fecha (µs), cantidad, longitudes de código, usuario y datos
+    _HEADER = struct.Struct('<BqiHHI')
+    FSYNC_POLICIES = ('always', 'batch', 'never')
+    
+    def __init__(self, directory: str, fsync_policy: str = 'batch',
+                 fsync_every: int = 100, snapshot_every: int = 10000):
+        if fsync_policy not in self.FSYNC_POLICIES:
+            raise ValueError(f"Política de fsync inválida: {fsync_policy}")
+        self.directory = directory
+        self.fsync_policy = fsync_policy
+        self.fsync_every = fsync_every
+        self.snapshot_every = snapshot_every
+        self.log_path = os.path.join(directory, 'journal.log')
+        self.snapshot_path = os.path.join(directory, 'snapshot.json')
+        os.makedirs(directory, exist_ok=True)
+        self._file = None
+        self._pending: List[bytes] = []
+        self._buffer_lock = threading.Lock()  # protege _pending y _since_snapshot
+        self._io_lock = threading.Lock()      # serializa escrituras y fsync del log
+        self._unsynced = 0
+        self._since_snapshot = 0
+        self._replaying = False
+    
+    # ----- escritura -----
+    
+    def _encode(self, kind: int, timestamp: datetime, quantity: int,
+                code: str, user: str = "", data: str = "") -> bytes:
+        code_b, user_b, data_b = code.encode('utf-8'), user.encode('utf-8'), data.encode('utf-8')
+        header = self._HEADER.pack(kind, to_epoch_us(timestamp), quantity,
+                                   len(code_b), len(user_b), len(data_b))
+        return header + code_b + user_b + data_b
+    
+    def append(self, products: List[Product] = (), movements: List[StockMovement] = (),
+               reservations: List[Reservation] = (), released: List[str] = ()) -> None:
+        """Encolar productos, reservas liberadas, movimientos y reservas nuevas como un solo bloque"""
+        if self._replaying:
+            return
+        now = datetime.now()
+        records = [self._encode(self.PRODUCT, now, 0, p.code, data=json.dumps(p.to_dict()))
+                   for p in products]
+        # Las liberaciones van antes que los movimientos: al confirmar una
+        # reserva, su salida solo es válida una vez liberado el stock
+        for reservation_id in released:
+            records.append(self._encode(self.RELEASE, now, 0, reservation_id))
+        for m in movements:
+            kind = self.ENTRY if m.movement_type == MovementType.ENTRY else self.EXIT
+            records.append(self._encode(kind, m.timestamp, m.quantity, m.product_code, m.user, m.description))
+        for r in reservations:
+            records.append(self._encode(self.RESERVATION, r.created, r.quantity, r.product_code,
+                                        r.owner, json.dumps(r.to_dict())))
+        if not records:
+            return
+        with self._buffer_lock:
+            self._pending.extend(records)
+            self._since_snapshot += len(records)
+    
+    def _write_pending(self) -> None:
+        """Escribir los registros encolados; requiere ``_io_lock``"""
+        with self._buffer_lock:
+            records, self._pending = self._pending, []
+        if records:
+            if self._file is None:
+                self._file = open(self.log_path, 'ab')
+            self._file.write(b''.join(records))
+            self._unsynced += len(records)
+    
+    def _sync_file(self) -> None:
+        """Forzar el archivo a disco; requiere ``_io_lock``"""
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync_policy != 'never':
+                os.fsync(self._file.fileno())
+        self._unsynced = 0
+    
+    def flush(self) -> None:
+        """Escribir los registros encolados aplicando la política de fsync"""
+        with self._io_lock:
+            self._write_pending()
+            if self._unsynced and (self.fsync_policy == 'always' or (
+                    self.fsync_policy == 'batch' and self._unsynced >= self.fsync_every)):
+                self._sync_file()
+    
+    def sync(self) -> None:
+        """Forzar los registros pendientes a disco"""
+        with self._io_lock:
+            self._write_pending()
+            self._sync_file()
+    
+    @property
+    def snapshot_due(self) -> bool:
+        """Indica si se alcanzó el intervalo de snapshots"""
+        return not self._replaying and self._since_snapshot >= self.snapshot_every
+    
+    def checkpoint(self, service: 'InventoryService') -> None:
+        """Escribir un snapshot si se alcanzó el intervalo configurado"""
+        if self.snapshot_due:
+            self.write_snapshot(service)
+    
+    def write_snapshot(self, service: 'InventoryService') -> None:
+        """Guardar el estado actual de forma atómica (archivo temporal + replace)"""
+        with self._io_lock:
+            self._write_pending()
+            self._sync_file()
+            offset = self._file.tell() if self._file is not None else self._log_size()
+        state = {
+            'log_offset': offset,
+            'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'movement_totals': {t.value: total for t, total in service.get_movement_totals().items()},
+            'items': [
+                {
+                    'product': item.product.to_dict(),
+                    'quantity': item.quantity,
+                    'sold': service.get_units_sold(item.product.code),
+                    'reservations': [r.to_dict() for r in item.reservations]
+                }
+                for item in service.get_all_inventory_items()
+            ]
+        }
+        temp_path = self.snapshot_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        self._since_snapshot = 0
+    
+    def close(self) -> None:
+        with self._io_lock:
+            self._write_pending()
+            self._sync_file()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+    
+    # ----- recuperación -----
+    
+    def _log_size(self) -> int:
+        return os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+    
+    def _read_records(self, offset: int):
+        """Leer registros desde una posición; un registro incompleto final se descarta"""
+        if not os.path.exists(self.log_path):
+            return
+        header_size = self._HEADER.size
+        with open(self.log_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        position = 0
+        while position + header_size <= len(data):
+            kind, timestamp, quantity, code_len, user_len, data_len = \
+                self._HEADER.unpack_from(data, position)
+            end = position + header_size + code_len + user_len + data_len
+            if end > len(data):
+                break
+            start = position + header_size
+            code = data[start:start + code_len].decode('utf-8')
+            user = data[start + code_len:start + code_len + user_len].decode('utf-8')
+            text = data[start + code_len + user_len:end].decode('utf-8')
+            yield kind, from_epoch_us(timestamp), quantity, code, user, text
+            position = end
+        if position < len(data):
+            # Escritura interrumpida: truncar el registro incompleto
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(offset + position)
+    
+    def restore(self, service: 'InventoryService') -> None:
+        """Cargar el último snapshot y reproducir solo el log posterior"""
+        offset = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                state = json.load(f)
+            offset = state['log_offset']
+            service.load_snapshot([
+                (Product(**entry['product']), entry['quantity'], entry['sold'],
+                 [Reservation.from_dict(r) for r in entry['reservations']])
+                for entry in state['items']
+            ], {MovementType(value): total for value, total in state['movement_totals'].items()})
+        
+        self._replaying = True
+        try:
+            pending: List[StockMovement] = []
+            for kind, timestamp, quantity, code, user, text in self._read_records(offset):
+                if kind in (self.ENTRY, self.EXIT):
+                    movement_type = MovementType.ENTRY if kind == self.ENTRY else MovementType.EXIT
+                    pending.append(StockMovement(code, quantity, movement_type, text, user, timestamp))
+                    continue
+                if pending:
+                    service.apply_movements(pending)
+                    pending = []
+                if kind == self.PRODUCT:
+                    service.register_product(Product(**json.loads(text)))
+                elif kind == self.RESERVATION:
+                    service.restore_reservation(Reservation.from_dict(json.loads(text)))
+                elif kind == self.RELEASE:
+                    service.release_reservation(code)
+                self._since_snapshot += 1
+            if pending:
+                service.apply_movements(pending)
+                self._since_snapshot += len(pending)
+        finally:
+            self._replaying = False
 
 
 # ============= GENERADORES DE REPORTES =============
 
+class ExportCancelled(Exception):
+    """La exportación fue cancelada por el usuario"""
+    pass
+
+
 class ReportGenerator(ABC):
     """Clase abstracta para generadores de reportes"""
     
+    # Líneas agrupadas por bloque al escribir en archivos o widgets
+    CHUNK_LINES = 500
+    # Filas por bloque en exportaciones CSV
+    CSV_CHUNK_ROWS = 5000
+    
     @abstractmethod
-    def generate(self, service: InventoryService) -> str:
+    def stream(self, service: InventoryService) -> Iterator[str]:
+        """Generar el reporte línea a línea"""
         pass
     
+    def iter_chunks(self, service: InventoryService, chunk_lines: Optional[int] = None) -> Iterator[str]:
+        """Agrupar las líneas del reporte en bloques de texto"""
+        chunk_lines = chunk_lines or self.CHUNK_LINES
+        buffer = []
+        for line in self.stream(service):
+            buffer.append(line)
+            if len(buffer) >= chunk_lines:
+                yield "".join(buffer)
+                buffer = []
+        if buffer:
+            yield "".join(buffer)
+    
+    def write_to(self, service: InventoryService, file: TextIO) -> None:
+        """Escribir el reporte directamente en un archivo, bloque a bloque"""
+        for chunk in self.iter_chunks(service):
+            file.write(chunk)
+    
+    def generate(self, service: InventoryService) -> str:
+        """Reporte completo como texto"""
+        return "".join(self.stream(service))
+    
     @abstractmethod
-    def export_csv(self, service: InventoryService, filename: str) -> None:
+    def export_csv(self, service: InventoryService, filename: str,
+                   progress: Optional[Callable[[int, int], None]] = None,
+                   cancel: Optional[threading.Event] = None) -> None:
         pass
     
+    def _write_csv(self, filename: str, header: List[str], rows: Iterable[list], total: int,
+                   progress: Optional[Callable[[int, int], None]] = None,
+                   cancel: Optional[threading.Event] = None) -> None:
+        """Escribir filas en bloques con writerows, informando avance y permitiendo cancelar"""
+        written = 0
+        try:
+            with open(filename, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                chunk = []
+                for row in rows:
+                    chunk.append(row)
+                    if len(chunk) >= self.CSV_CHUNK_ROWS:
+                        if cancel is not None and cancel.is_set():
+                            raise ExportCancelled("Exportación cancelada")
+                        writer.writerows(chunk)
+                        written += len(chunk)
+                        chunk = []
+                        if progress is not None:
+                            progress(written, total)
+                writer.writerows(chunk)
+                written += len(chunk)
+        except ExportCancelled:
+            os.remove(filename)
+            raise
+        if progress is not None:
+            progress(written, total)
+    
     def export_pdf(self, service: InventoryService, filename: str) -> None:
         """Método por defecto para PDF (puede ser sobrescrito)"""
         if not PDF_AVAILABLE:
@@ -443,103 +2442,106 @@ class ReportGenerator(ABC):
 class InventoryReport(ReportGenerator):
     """Reporte completo de inventario"""
     
-    def generate(self, service: InventoryService) -> str:
+    def stream(self, service: InventoryService) -> Iterator[str]:
         items = service.get_all_inventory_items()
         stats = service.get_inventory_statistics()
         
-        report = "=" * 100 + "\n"
-        report += " " * 35 + "REPORTE DE INVENTARIO ACTUAL\n"
-        report += "=" * 100 + "\n\n"
+        yield "=" * 100 + "\n"
+        yield " " * 35 + "REPORTE DE INVENTARIO ACTUAL\n"
+        yield "=" * 100 + "\n\n"
         
-        report += f"Total de Productos: {stats['total_products']}\n"
-        report += f"Total de Items: {stats['total_items']}\n"
-        report += f"Valor Total: S/ {stats['total_value']:,.2f}\n"
-        report += f"Productos con Stock Bajo: {stats['low_stock_count']}\n"
-        report += f"Productos Críticos: {stats['critical_stock_count']}\n\n"
+        yield f"Total de Productos: {stats['total_products']}\n"
+        yield f"Total de Items: {stats['total_items']}\n"
+        yield f"Valor Total: S/ {stats['total_value']:,.2f}\n"
+        yield f"Productos con Stock Bajo: {stats['low_stock_count']}\n"
+        yield f"Productos Críticos: {stats['critical_stock_count']}\n\n"
         
-        report += "-" * 100 + "\n"
-        report += f"{'Código':<10} {'Nombre':<25} {'Categoría':<15} {'Stock':<8} {'Reserv.':<8} {'Disp.':<8} {'Estado':<12}\n"
-        report += "-" * 100 + "\n"
+        yield "-" * 100 + "\n"
+        yield f"{'Código':<10} {'Nombre':<25} {'Categoría':<15} {'Stock':<8} {'Reserv.':<8} {'Disp.':<8} {'Estado':<12}\n"
+        yield "-" * 100 + "\n"
         
         for item in sorted(items, key=lambda x: x.product.code):
             alert = item.get_alert_level()
             status = "🔴 CRÍTICO" if alert == AlertLevel.CRITICAL else "⚠️ BAJO" if alert == AlertLevel.LOW else "✅ NORMAL"
             
-            report += f"{item.product.code:<10} {item.product.name:<25} {item.product.category:<15} "
-            report += f"{item.quantity:<8} {item.reserved_quantity:<8} {item.available_quantity:<8} {status:<12}\n"
+            yield (f"{item.product.code:<10} {item.product.name:<25} {item.product.category:<15} "
+                   f"{item.quantity:<8} {item.reserved_quantity:<8} {item.available_quantity:<8} {status:<12}\n")
         
-        report += "=" * 100 + "\n"
-        return report
+        yield "=" * 100 + "\n"
     
-    def export_csv(self, service: InventoryService, filename: str) -> None:
+    def export_csv(self, service: InventoryService, filename: str,
+                   progress: Optional[Callable[[int, int], None]] = None,
+                   cancel: Optional[threading.Event] = None) -> None:
         items = service.get_all_inventory_items()
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Código', 'Nombre', 'Categoría', 'Precio', 'Stock', 'Reservado', 'Disponible', 'Estado'])
-            for item in items:
-                alert = item.get_alert_level()
-                status = "CRÍTICO" if alert == AlertLevel.CRITICAL else "BAJO" if alert == AlertLevel.LOW else "NORMAL"
-                writer.writerow([
-                    item.product.code, item.product.name, item.product.category,
-                    item.product.price, item.quantity, item.reserved_quantity,
-                    item.available_quantity, status
-                ])
+        status_names = {AlertLevel.CRITICAL: "CRÍTICO", AlertLevel.LOW: "BAJO", AlertLevel.NORMAL: "NORMAL"}
+        rows = ([
+            item.product.code, item.product.name, item.product.category,
+            item.product.price, item.quantity, item.reserved_quantity,
+            item.available_quantity, status_names[item.get_alert_level()]
+        ] for item in items)
+        self._write_csv(
+            filename,
+            ['Código', 'Nombre', 'Categoría', 'Precio', 'Stock', 'Reservado', 'Disponible', 'Estado'],
+            rows, len(items), progress, cancel
+        )
 
 
 class SalesAnalysisReport(ReportGenerator):
     """Reporte de análisis de ventas - productos más y menos vendidos"""
     
-    def generate(self, service: InventoryService) -> str:
+    def stream(self, service: InventoryService) -> Iterator[str]:
         most_sold = service.get_most_sold_products(10)
         least_sold = service.get_least_sold_products(10)
         
-        report = "=" * 100 + "\n"
-        report += " " * 30 + "REPORTE DE ANÁLISIS DE VENTAS\n"
-        report += "=" * 100 + "\n\n"
+        yield "=" * 100 + "\n"
+        yield " " * 30 + "REPORTE DE ANÁLISIS DE VENTAS\n"
+        yield "=" * 100 + "\n\n"
         
         # Productos más vendidos
-        report += "🔥 TOP 10 PRODUCTOS MÁS VENDIDOS\n"
-        report += "-" * 100 + "\n"
-        report += f"{'Posición':<10} {'Código':<12} {'Nombre':<35} {'Categoría':<20} {'Unidades':<15}\n"
-        report += "-" * 100 + "\n"
+        yield "🔥 TOP 10 PRODUCTOS MÁS VENDIDOS\n"
+        yield "-" * 100 + "\n"
+        yield f"{'Posición':<10} {'Código':<12} {'Nombre':<35} {'Categoría':<20} {'Unidades':<15}\n"
+        yield "-" * 100 + "\n"
         
         for i, (code, qty) in enumerate(most_sold, 1):
             product = service._product_repo.get(code)
             if product:
-                report += f"#{i:<9} {code:<12} {product.name:<35} {product.category:<20} {qty:<15}\n"
+                yield f"#{i:<9} {code:<12} {product.name:<35} {product.category:<20} {qty:<15}\n"
         
         if not most_sold:
-            report += "No hay datos de ventas disponibles\n"
+            yield "No hay datos de ventas disponibles\n"
         
-        report += "\n"
+        yield "\n"
         
         # Productos menos vendidos
-        report += "📉 TOP 10 PRODUCTOS MENOS VENDIDOS\n"
-        report += "-" * 100 + "\n"
-        report += f"{'Posición':<10} {'Código':<12} {'Nombre':<35} {'Categoría':<20} {'Unidades':<15}\n"
-        report += "-" * 100 + "\n"
+        yield "📉 TOP 10 PRODUCTOS MENOS VENDIDOS\n"
+        yield "-" * 100 + "\n"
+        yield f"{'Posición':<10} {'Código':<12} {'Nombre':<35} {'Categoría':<20} {'Unidades':<15}\n"
+        yield "-" * 100 + "\n"
         
         for i, (code, qty) in enumerate(least_sold, 1):
             product = service._product_repo.get(code)
             if product:
-                report += f"#{i:<9} {code:<12} {product.name:<35} {product.category:<20} {qty:<15}\n"
+                yield f"#{i:<9} {code:<12} {product.name:<35} {product.category:<20} {qty:<15}\n"
         
-        report += "\n"
+        yield "\n"
         
         # Estadísticas generales
-        total_exits = sum(m.quantity for m in service._movement_repo.get_by_type(MovementType.EXIT))
-        total_entries = sum(m.quantity for m in service._movement_repo.get_by_type(MovementType.ENTRY))
+        total_exits = service.get_movement_total(MovementType.EXIT)
+        total_entries = service.get_movement_total(MovementType.ENTRY)
         
-        report += "📊 ESTADÍSTICAS GENERALES\n"
-        report += "-" * 100 + "\n"
-        report += f"Total de Salidas (Ventas): {total_exits} unidades\n"
-        report += f"Total de Entradas: {total_entries} unidades\n"
-        report += f"Movimientos Netos: {total_entries - total_exits} unidades\n"
+        yield "📊 ESTADÍSTICAS GENERALES\n"
+        yield "-" * 100 + "\n"
+        yield f"Total de Salidas (Ventas): {total_exits} unidades\n"
+        yield f"Total de Entradas: {total_entries} unidades\n"
+        yield f"Movimientos Netos: {total_entries - total_exits} unidades\n"
         
-        report += "=" * 100 + "\n"
-        return report
+        yield "=" * 100 + "\n"
     
-    def export_csv(self, service: InventoryService, filename: str) -> None:
+    def export_csv(self, service: InventoryService, filename: str,
+                   progress: Optional[Callable[[int, int], None]] = None,
+                   cancel: Optional[threading.Event] = None) -> None:
+        # Solo 20 filas: no necesita avance ni cancelación
         most_sold = service.get_most_sold_products(10)
         least_sold = service.get_least_sold_products(10)
         
@@ -569,6 +2571,13 @@ class SalesAnalysisReport(ReportGenerator):
         if not PDF_AVAILABLE:
             raise Exception("ReportLab no está instalado. Instale con: pip install reportlab")
         
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib import colors
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.enums import TA_CENTER
+        
         doc = SimpleDocTemplate(filename, pagesize=letter)
         elements = []
         styles = getSampleStyleSheet()
@@ -664,8 +2673,8 @@ class SalesAnalysisReport(ReportGenerator):
         elements.append(Spacer(1, 0.5*inch))
         
         # Estadísticas
-        total_exits = sum(m.quantity for m in service._movement_repo.get_by_type(MovementType.EXIT))
-        total_entries = sum(m.quantity for m in service._movement_repo.get_by_type(MovementType.ENTRY))
+        total_exits = service.get_movement_total(MovementType.EXIT)
+        total_entries = service.get_movement_total(MovementType.ENTRY)
         
         elements.append(Paragraph("📊 ESTADÍSTICAS GENERALES", styles['Heading2']))
         elements.append(Spacer(1, 0.2*inch))
@@ -697,106 +2706,114 @@ class SalesAnalysisReport(ReportGenerator):
 class MovementsReport(ReportGenerator):
     """Reporte de movimientos de inventario"""
     
-    def generate(self, service: InventoryService) -> str:
-        movements = service._movement_repo.get_all()
+    def stream(self, service: InventoryService) -> Iterator[str]:
+        # Solo los últimos 50: se recorta la vista sin copiar el historial
+        recent = service._movement_repo.get_all_view()[-50:]
         
-        report = "=" * 110 + "\n"
-        report += " " * 40 + "REPORTE DE MOVIMIENTOS\n"
-        report += "=" * 110 + "\n\n"
+        yield "=" * 110 + "\n"
+        yield " " * 40 + "REPORTE DE MOVIMIENTOS\n"
+        yield "=" * 110 + "\n\n"
         
-        report += f"{'Fecha/Hora':<20} {'Código':<10} {'Tipo':<10} {'Cantidad':<10} {'Usuario':<15} {'Descripción':<35}\n"
-        report += "-" * 110 + "\n"
+        yield f"{'Fecha/Hora':<20} {'Código':<10} {'Tipo':<10} {'Cantidad':<10} {'Usuario':<15} {'Descripción':<35}\n"
+        yield "-" * 110 + "\n"
         
-        for mov in reversed(movements[-50:]):
+        for mov in reversed(recent):
             mov_type = "➕ ENTRADA" if mov.movement_type == MovementType.ENTRY else "➖ SALIDA"
             mov_dict = mov.to_dict()
-            report += f"{mov_dict['timestamp']:<20} {mov.product_code:<10} {mov_type:<10} "
-            report += f"{mov.quantity:<10} {mov.user:<15} {mov_dict['description']:<35}\n"
+            yield (f"{mov_dict['timestamp']:<20} {mov.product_code:<10} {mov_type:<10} "
+                   f"{mov.quantity:<10} {mov.user:<15} {mov_dict['description']:<35}\n")
         
-        report += "=" * 110 + "\n"
-        return report
+        yield "=" * 110 + "\n"
     
-    def export_csv(self, service: InventoryService, filename: str) -> None:
-        movements = service._movement_repo.get_all()
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Fecha/Hora', 'Código', 'Tipo', 'Cantidad', 'Usuario', 'Descripción'])
+    def export_csv(self, service: InventoryService, filename: str,
+                   progress: Optional[Callable[[int, int], None]] = None,
+                   cancel: Optional[threading.Event] = None) -> None:
+        # Vista sin copiar: el historial puede tener millones de movimientos
+        movements = service._movement_repo.get_all_view()
+        type_names = {MovementType.ENTRY: "ENTRADA", MovementType.EXIT: "SALIDA"}
+        
+        def rows():
+            # str(datetime)[:19] equivale a '%Y-%m-%d %H:%M:%S' sin pasar por strftime
             for mov in movements:
-                mov_dict = mov.to_dict()
-                mov_type = "ENTRADA" if mov.movement_type == MovementType.ENTRY else "SALIDA"
-                writer.writerow([
-                    mov_dict['timestamp'], mov.product_code, mov_type,
-                    mov.quantity, mov.user, mov_dict['description']
-                ])
+                yield [str(mov.timestamp)[:19], mov.product_code, type_names[mov.movement_type],
+                       mov.quantity, mov.user, mov.description]
+        
+        self._write_csv(
+            filename,
+            ['Fecha/Hora', 'Código', 'Tipo', 'Cantidad', 'Usuario', 'Descripción'],
+            rows(), len(movements), progress, cancel
+        )
 
 
 class AlertsReport(ReportGenerator):
     """Reporte de alertas de stock"""
     
-    def generate(self, service: InventoryService) -> str:
+    def stream(self, service: InventoryService) -> Iterator[str]:
         critical = service.get_critical_stock_items()
-        low = [item for item in service.get_low_stock_items() 
-               if item.get_alert_level() == AlertLevel.LOW]
+        low = [item for item in service.get_low_stock_items()
+               if service.get_alert_level(item.product.code) == AlertLevel.LOW]
         
-        report = "=" * 90 + "\n"
-        report += " " * 30 + "REPORTE DE ALERTAS DE STOCK\n"
-        report += "=" * 90 + "\n\n"
+        yield "=" * 90 + "\n"
+        yield " " * 30 + "REPORTE DE ALERTAS DE STOCK\n"
+        yield "=" * 90 + "\n\n"
         
-        report += "🔴 PRODUCTOS CRÍTICOS (< 25% del stock mínimo)\n"
-        report += "-" * 90 + "\n"
+        yield "🔴 PRODUCTOS CRÍTICOS (< 25% del stock mínimo)\n"
+        yield "-" * 90 + "\n"
         
         if critical:
-            report += f"{'Código':<10} {'Nombre':<25} {'Stock':<10} {'Mínimo':<10} {'Porcentaje':<15}\n"
-            report += "-" * 90 + "\n"
+            yield f"{'Código':<10} {'Nombre':<25} {'Stock':<10} {'Mínimo':<10} {'Porcentaje':<15}\n"
+            yield "-" * 90 + "\n"
             for item in critical:
-                report += f"{item.product.code:<10} {item.product.name:<25} {item.quantity:<10} "
-                report += f"{item.product.min_stock:<10} {item.get_stock_percentage():<14.1f}%\n"
+                yield (f"{item.product.code:<10} {item.product.name:<25} {item.quantity:<10} "
+                       f"{item.product.min_stock:<10} {item.get_stock_percentage():<14.1f}%\n")
         else:
-            report += "✅ No hay productos en estado crítico\n"
+            yield "✅ No hay productos en estado crítico\n"
         
-        report += "\n"
+        yield "\n"
         
-        report += "⚠️ PRODUCTOS CON STOCK BAJO\n"
-        report += "-" * 90 + "\n"
+        yield "⚠️ PRODUCTOS CON STOCK BAJO\n"
+        yield "-" * 90 + "\n"
         
         if low:
-            report += f"{'Código':<10} {'Nombre':<25} {'Stock':<10} {'Mínimo':<10} {'Faltante':<15}\n"
-            report += "-" * 90 + "\n"
+            yield f"{'Código':<10} {'Nombre':<25} {'Stock':<10} {'Mínimo':<10} {'Faltante':<15}\n"
+            yield "-" * 90 + "\n"
             for item in low:
                 diff = item.product.min_stock - item.quantity
-                report += f"{item.product.code:<10} {item.product.name:<25} {item.quantity:<10} "
-                report += f"{item.product.min_stock:<10} {diff:<15}\n"
+                yield (f"{item.product.code:<10} {item.product.name:<25} {item.quantity:<10} "
+                       f"{item.product.min_stock:<10} {diff:<15}\n")
         else:
-            report += "✅ No hay productos con stock bajo\n"
+            yield "✅ No hay productos con stock bajo\n"
         
-        report += "=" * 90 + "\n"
-        return report
+        yield "=" * 90 + "\n"
     
-    def export_csv(self, service: InventoryService, filename: str) -> None:
+    def export_csv(self, service: InventoryService, filename: str,
+                   progress: Optional[Callable[[int, int], None]] = None,
+                   cancel: Optional[threading.Event] = None) -> None:
         items = service.get_low_stock_items()
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Código', 'Nombre', 'Stock Actual', 'Stock Mínimo', 'Nivel de Alerta', 'Porcentaje'])
-            for item in items:
-                alert = "CRÍTICO" if item.get_alert_level() == AlertLevel.CRITICAL else "BAJO"
-                writer.writerow([
-                    item.product.code, item.product.name, item.quantity,
-                    item.product.min_stock, alert, f"{item.get_stock_percentage():.1f}%"
-                ])
+        rows = ([
+            item.product.code, item.product.name, item.quantity, item.product.min_stock,
+            "CRÍTICO" if service.get_alert_level(item.product.code) == AlertLevel.CRITICAL else "BAJO",
+            f"{item.get_stock_percentage():.1f}%"
+        ] for item in items)
+        self._write_csv(
+            filename,
+            ['Código', 'Nombre', 'Stock Actual', 'Stock Mínimo', 'Nivel de Alerta', 'Porcentaje'],
+            rows, len(items), progress, cancel
+        )
 
 
 class ValueReport(ReportGenerator):
     """Reporte de valorización del inventario"""
     
-    def generate(self, service: InventoryService) -> str:
+    def stream(self, service: InventoryService) -> Iterator[str]:
         items = service.get_all_inventory_items()
         
-        report = "=" * 95 + "\n"
-        report += " " * 30 + "REPORTE DE VALORIZACIÓN\n"
-        report += "=" * 95 + "\n\n"
+        yield "=" * 95 + "\n"
+        yield " " * 30 + "REPORTE DE VALORIZACIÓN\n"
+        yield "=" * 95 + "\n\n"
         
-        report += f"{'Código':<10} {'Nombre':<25} {'Categoría':<15} {'Cantidad':<10} {'P.Unit':<12} {'Total':<15}\n"
-        report += "-" * 95 + "\n"
+        yield f"{'Código':<10} {'Nombre':<25} {'Categoría':<15} {'Cantidad':<10} {'P.Unit':<12} {'Total':<15}\n"
+        yield "-" * 95 + "\n"
         
         total_value = 0
         category_values = {}
@@ -809,101 +2826,697 @@ class ValueReport(ReportGenerator):
                 category_values[item.product.category] = 0
             category_values[item.product.category] += item_value
             
-            report += f"{item.product.code:<10} {item.product.name:<25} {item.product.category:<15} "
-            report += f"{item.quantity:<10} S/ {item.product.price:<11.2f} S/ {item_value:<14.2f}\n"
+            yield (f"{item.product.code:<10} {item.product.name:<25} {item.product.category:<15} "
+                   f"{item.quantity:<10} S/ {item.product.price:<11.2f} S/ {item_value:<14.2f}\n")
         
-        report += "-" * 95 + "\n"
-        report += f"{'VALOR TOTAL DEL INVENTARIO:':<70} S/ {total_value:,.2f}\n"
-        report += "\n"
+        yield "-" * 95 + "\n"
+        yield f"{'VALOR TOTAL DEL INVENTARIO:':<70} S/ {total_value:,.2f}\n"
+        yield "\n"
         
-        report += "VALOR POR CATEGORÍA\n"
-        report += "-" * 50 + "\n"
+        yield "VALOR POR CATEGORÍA\n"
+        yield "-" * 50 + "\n"
         for category, value in sorted(category_values.items(), key=lambda x: x[1], reverse=True):
             percentage = (value / total_value * 100) if total_value > 0 else 0
-            report += f"{category:<30} S/ {value:>12,.2f} ({percentage:>5.1f}%)\n"
+            yield f"{category:<30} S/ {value:>12,.2f} ({percentage:>5.1f}%)\n"
         
-        report += "=" * 95 + "\n"
-        return report
+        yield "=" * 95 + "\n"
     
-    def export_csv(self, service: InventoryService, filename: str) -> None:
+    def export_csv(self, service: InventoryService, filename: str,
+                   progress: Optional[Callable[[int, int], None]] = None,
+                   cancel: Optional[threading.Event] = None) -> None:
         items = service.get_all_inventory_items()
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Código', 'Nombre', 'Categoría', 'Cantidad', 'Precio Unitario', 'Valor Total'])
-            for item in items:
-                item_value = item.quantity * item.product.price
-                writer.writerow([
-                    item.product.code, item.product.name, item.product.category,
-                    item.quantity, item.product.price, item_value
-                ])
+        rows = ([
+            item.product.code, item.product.name, item.product.category,
+            item.quantity, item.product.price, item.quantity * item.product.price
+        ] for item in items)
+        self._write_csv(
+            filename,
+            ['Código', 'Nombre', 'Categoría', 'Cantidad', 'Precio Unitario', 'Valor Total'],
+            rows, len(items), progress, cancel
+        )
+
+
+class ReportCache:
+    """Caché LRU de reportes generados y archivos exportados.
+    
+    Las entradas se indexan por clase de reporte y formato, y guardan la
+    versión del servicio con la que se generaron: mientras la versión no
+    cambie se reutilizan el texto y los archivos ya producidos.
+    """
+    
+    def __init__(self, service: InventoryService, max_entries: int = 16):
+        if max_entries <= 0:
+            raise ValueError("El tamaño de la caché debe ser positivo")
+        self._service = service
+        self._max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def _lookup(self, key: tuple, version: int):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def _store(self, key: tuple, version: int, value) -> None:
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+    
+    def chunks(self, report: ReportGenerator, cancel: Optional[threading.Event] = None) -> List[str]:
+        """Bloques de texto del reporte (ver ReportGenerator.iter_chunks)"""
+        key = (type(report), 'text')
+        version = self._service.version
+        cached = self._lookup(key, version)
+        if cached is None:
+            cached = []
+            for chunk in report.iter_chunks(self._service):
+                if cancel is not None and cancel.is_set():
+                    raise ExportCancelled("Reporte cancelado")
+                cached.append(chunk)
+            self._store(key, version, cached)
+        return cached
+    
+    def generate(self, report: ReportGenerator) -> str:
+        """Reporte completo como texto, reutilizando el anterior si el estado no cambió"""
+        return "".join(self.chunks(report))
+    
+    def export_csv(self, report: ReportGenerator, filename: str,
+                   progress: Optional[Callable[[int, int], None]] = None,
+                   cancel: Optional[threading.Event] = None) -> None:
+        self._export(report, 'csv', filename,
+                     lambda: report.export_csv(self._service, filename, progress, cancel), progress)
+    
+    def export_pdf(self, report: ReportGenerator, filename: str,
+                   progress: Optional[Callable[[int, int], None]] = None) -> None:
+        self._export(report, 'pdf', filename,
+                     lambda: report.export_pdf(self._service, filename), progress)
+    
+    def _export(self, report: ReportGenerator, kind: str, filename: str,
+                export: Callable[[], None], progress: Optional[Callable[[int, int], None]]) -> None:
+        """Copiar el último archivo exportado si sigue intacto; si no, exportar de nuevo"""
+        key = (type(report), kind)
+        version = self._service.version
+        cached = self._lookup(key, version)
+        if cached is not None:
+            path, mtime, size = cached
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if stat is not None and (stat.st_mtime_ns, stat.st_size) == (mtime, size):
+                if os.path.abspath(path) != os.path.abspath(filename):
+                    shutil.copyfile(path, filename)
+                if progress is not None:
+                    progress(1, 1)
+                return
+        
+        export()
+        stat = os.stat(filename)
+        self._store(key, version, (filename, stat.st_mtime_ns, stat.st_size))
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# ============= EJECUCIÓN EN SEGUNDO PLANO =============
+
+class ReportJobExecutor:
+    """Ejecuta reportes y exportaciones en un pool de hilos.
+    
+    Cada tarea recibe ``(progress, cancel)``; el avance y el resultado se
+    publican en ``results`` como tuplas ``(job_id, tipo, datos)`` con tipo
+    'progress', 'done', 'error' o 'cancelled', para que la interfaz las
+    consuma desde su propio hilo. Se usan hilos y no procesos porque el
+    servicio y sus repositorios no se pueden serializar entre procesos.
+    """
+    
+    def __init__(self, max_workers: int = 3):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='reporte')
+        self.results: queue.Queue = queue.Queue()
+        self._jobs: Dict[int, threading.Event] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+    
+    def submit(self, task: Callable[[Callable, threading.Event], object]) -> int:
+        """Encolar una tarea y devolver su identificador"""
+        with self._lock:
+            job_id = self._next_id
+            self._next_id += 1
+            cancel = self._jobs[job_id] = threading.Event()
+        
+        def progress(done: int, total: int) -> None:
+            self.results.put((job_id, 'progress', (done, total)))
+        
+        def run():
+            try:
+                if cancel.is_set():
+                    raise ExportCancelled("Trabajo cancelado")
+                result = task(progress, cancel)
+            except ExportCancelled:
+                self.results.put((job_id, 'cancelled', None))
+            except Exception as e:
+                self.results.put((job_id, 'error', e))
+            else:
+                self.results.put((job_id, 'done', result))
+            finally:
+                with self._lock:
+                    self._jobs.pop(job_id, None)
+        
+        self._pool.submit(run)
+        return job_id
+    
+    def cancel(self, job_id: int) -> None:
+        with self._lock:
+            event = self._jobs.get(job_id)
+        if event is not None:
+            event.set()
+    
+    def cancel_all(self) -> None:
+        with self._lock:
+            events = list(self._jobs.values())
+        for event in events:
+            event.set()
+    
+    def active_jobs(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+    
+    def shutdown(self) -> None:
+        self.cancel_all()
+        self._pool.shutdown(wait=False)
+
+
+class MovementIngestor:
+    """Ingesta asíncrona de movimientos para terminales y scanners.
+    
+    Los movimientos entran en una cola acotada y un hilo dedicado los aplica
+    en micro-lotes con ``apply_movements``. Cada envío devuelve un Future con
+    el movimiento registrado o con el error de validación. Si un lote falla,
+    se reintenta movimiento a movimiento para que solo fallen los inválidos.
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, service: InventoryService, max_queue: int = 10000,
+                 max_batch: int = 500, max_wait: float = 0.002, window: int = 1000):
+        if max_queue <= 0 or max_batch <= 0:
+            raise ValueError("El tamaño de cola y de lote deben ser positivos")
+        self._service = service
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._worker: Optional[threading.Thread] = None
+        
+        self._metrics_lock = threading.Lock()
+        self._latency_ms = deque(maxlen=window)   # envío -> resultado
+        self._batch_ms = deque(maxlen=window)     # duración de cada apply
+        self._max_depth = 0
+        self.submitted = 0
+        self.applied = 0
+        self.failed = 0
+        self.batches = 0
+    
+    def start(self) -> 'MovementIngestor':
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name='ingesta', daemon=True)
+            self._worker.start()
+        return self
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Aplicar lo pendiente y detener el hilo"""
+        if self._worker is not None:
+            self._queue.put(self._STOP)
+            self._worker.join(timeout)
+            self._worker = None
+    
+    def submit(self, movement: StockMovement, timeout: Optional[float] = None) -> Future:
+        """Encolar un movimiento; bloquea si la cola está llena (queue.Full tras ``timeout``)"""
+        if self._worker is None:
+            raise RuntimeError("El ingestor no está iniciado")
+        future = Future()
+        self._queue.put((movement, future, time.perf_counter()), timeout=timeout)
+        with self._metrics_lock:
+            self.submitted += 1
+            self._max_depth = max(self._max_depth, self._queue.qsize())
+        return future
+    
+    def _next_batch(self) -> tuple:
+        """Esperar el primer comando y juntar los que lleguen poco después"""
+        batch = []
+        stop = False
+        item = self._queue.get()
+        deadline = time.perf_counter() + self.max_wait
+        while True:
+            if item is self._STOP:
+                stop = True
+            elif item[1].set_running_or_notify_cancel():  # omitir los cancelados
+                batch.append(item)
+            if stop or len(batch) >= self.max_batch:
+                break
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+        return batch, stop
+    
+    def _run(self) -> None:
+        while True:
+            batch, stop = self._next_batch()
+            if batch:
+                self._apply(batch)
+            if stop:
+                break
+    
+    def _apply(self, batch: List[tuple]) -> None:
+        started = time.perf_counter()
+        try:
+            self._service.apply_movements([movement for movement, _, _ in batch])
+            results = [(future, submitted, movement, None) for movement, future, submitted in batch]
+        except Exception:
+            # Lote inválido: aplicar uno a uno para aislar los errores
+            results = []
+            for movement, future, submitted in batch:
+                try:
+                    self._service.apply_movements([movement])
+                    results.append((future, submitted, movement, None))
+                except Exception as e:
+                    results.append((future, submitted, None, e))
+        finished = time.perf_counter()
+        
+        with self._metrics_lock:
+            self.batches += 1
+            self._batch_ms.append((finished - started) * 1000)
+            for future, submitted, _, error in results:
+                self._latency_ms.append((finished - submitted) * 1000)
+                if error is None:
+                    self.applied += 1
+                else:
+                    self.failed += 1
+        for future, _, movement, error in results:
+            if error is None:
+                future.set_result(movement)
+            else:
+                future.set_exception(error)
+    
+    def get_metrics(self) -> Dict:
+        """Profundidad de cola, contadores y latencias (ventana reciente)"""
+        with self._metrics_lock:
+            latencies = sorted(self._latency_ms)
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_depth_max': self._max_depth,
+                'submitted': self.submitted,
+                'applied': self.applied,
+                'failed': self.failed,
+                'batches': self.batches,
+                'avg_batch_size': (self.applied + self.failed) / self.batches if self.batches else 0.0,
+                'apply_ms_avg': sum(self._batch_ms) / len(self._batch_ms) if self._batch_ms else 0.0,
+                'latency_ms_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+                'latency_ms_p95': latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+            }
 
 
 # ============= SCANNER DE CÓDIGO DE BARRAS =============
 
-class BarcodeScanner:
-    """Scanner de código de barras usando cámara"""
+class FrameBuffer:
+    """Buffer acotado de frames entre la captura y la decodificación.
+    
+    Si el decodificador va retrasado, el frame más antiguo se descarta: siempre
+    se procesa la imagen más reciente de la cámara.
+    """
+    
+    def __init__(self, capacity: int = 2):
+        if capacity <= 0:
+            raise ValueError("La capacidad del buffer debe ser positiva")
+        self._frames = deque(maxlen=capacity)
+        self._condition = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+    
+    def put(self, frame, timestamp: float, drop_oldest: bool = True) -> None:
+        """Añadir un frame; sin ``drop_oldest`` espera a que haya sitio"""
+        with self._condition:
+            if not drop_oldest:
+                while len(self._frames) == self._frames.maxlen and not self._closed:
+                    self._condition.wait()
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._frames.append((frame, timestamp))
+            self._condition.notify_all()
+    
+    def get(self, timeout: Optional[float] = None) -> Optional[tuple]:
+        """Siguiente (frame, instante de captura), o None si se cerró o venció el plazo"""
+        with self._condition:
+            if not self._frames and not self._closed:
+                self._condition.wait(timeout)
+            if not self._frames:
+                return None
+            item = self._frames.popleft()
+            self._condition.notify_all()
+            return item
+    
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+    
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+
+class ScanMetrics:
+    """Métricas de rendimiento del scanner (ventana de las últimas muestras)"""
+    
+    def __init__(self, window: int = 120):
+        self._lock = threading.Lock()
+        self._captured = deque(maxlen=window)   # instantes de captura
+        self._decoded = deque(maxlen=window)    # instantes de decodificación
+        self._decode_ms = deque(maxlen=window)  # tiempo de pyzbar.decode
+        self._latency_ms = deque(maxlen=window) # captura -> resultado
+        self.frames_captured = 0
+        self.frames_decoded = 0
+    
+    def record_capture(self, timestamp: float) -> None:
+        with self._lock:
+            self._captured.append(timestamp)
+            self.frames_captured += 1
+    
+    def record_decode(self, captured_at: float, started_at: float, finished_at: float) -> None:
+        with self._lock:
+            self._decoded.append(finished_at)
+            self._decode_ms.append((finished_at - started_at) * 1000)
+            self._latency_ms.append((finished_at - captured_at) * 1000)
+            self.frames_decoded += 1
+    
+    @staticmethod
+    def _rate(timestamps: deque) -> float:
+        if len(timestamps) < 2 or timestamps[-1] == timestamps[0]:
+            return 0.0
+        return (len(timestamps) - 1) / (timestamps[-1] - timestamps[0])
+    
+    def snapshot(self, dropped: int = 0) -> Dict:
+        with self._lock:
+            latencies = sorted(self._latency_ms)
+            return {
+                'capture_fps': self._rate(self._captured),
+                'decode_fps': self._rate(self._decoded),
+                'decode_ms_avg': sum(self._decode_ms) / len(self._decode_ms) if self._decode_ms else 0.0,
+                'latency_ms_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+                'latency_ms_p95': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+                'frames_captured': self.frames_captured,
+                'frames_decoded': self.frames_decoded,
+                'frames_dropped': dropped
+            }
+
+
+def preprocess_frame(cv2, frame, roi: Optional[tuple] = None, max_width: Optional[int] = 640):
+    """Recortar a la región de interés, pasar a escala de grises y reducir.
+    
+    ``roi`` es (x, y, ancho, alto) en fracciones del frame, p. ej. (0.25, 0.25, 0.5, 0.5).
+    """
+    if roi is not None:
+        height, width = frame.shape[:2]
+        x, y, w, h = roi
+        frame = frame[int(y * height):int((y + h) * height), int(x * width):int((x + w) * width)]
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if max_width and frame.shape[1] > max_width:
+        scale = max_width / frame.shape[1]
+        frame = cv2.resize(frame, (max_width, max(1, int(frame.shape[0] * scale))),
+                           interpolation=cv2.INTER_AREA)
+    return frame
+
+
+class FrameSource(ABC):
+    """Origen de frames para el scanner"""
+    
+    # Las fuentes en vivo descartan frames atrasados; las de archivo los procesan todos
+    is_live = False
+    
+    def open(self) -> None:
+        """Preparar la fuente antes de leer"""
+        pass
+    
+    @abstractmethod
+    def read(self):
+        """Siguiente frame, o None si no hay (al terminar, en fuentes de archivo)"""
+        pass
+    
+    def release(self) -> None:
+        pass
+
+
+class CameraSource(FrameSource):
+    """Cámara conectada al equipo"""
+    
+    is_live = True
+    
+    def __init__(self, index: int = 0):
+        self.index = index
+        self._cap = None
+    
+    def open(self) -> None:
+        cv2, _, _ = load_barcode_libs()
+        self._cap = cv2.VideoCapture(self.index)
+    
+    def read(self):
+        ret, frame = self._cap.read()
+        return frame if ret else None
+    
+    def release(self) -> None:
+        if self._cap is not None:
+            self._cap.release()
+
+
+class VideoFileSource(FrameSource):
+    """Archivo de video leído frame a frame"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._cap = None
+    
+    def open(self) -> None:
+        cv2, _, _ = load_barcode_libs()
+        self._cap = cv2.VideoCapture(self.path)
+        if not self._cap.isOpened():
+            raise ValueError(f"No se pudo abrir el video {self.path}")
+    
+    def read(self):
+        ret, frame = self._cap.read()
+        return frame if ret else None
+    
+    def release(self) -> None:
+        if self._cap is not None:
+            self._cap.release()
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+
+def list_images(directory: str) -> List[str]:
+    """Rutas de las imágenes de un directorio, en orden alfabético"""
+    if not os.path.isdir(directory):
+        raise ValueError(f"El directorio {directory} no existe")
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+class ImageDirectorySource(FrameSource):
+    """Imágenes de un directorio, una por frame"""
+    
+    def __init__(self, directory: str):
+        self.paths = list_images(directory)
+        self._next = 0
+        self._cv2 = None
+    
+    def open(self) -> None:
+        self._cv2, _, _ = load_barcode_libs()
+    
+    def read(self):
+        while self._next < len(self.paths):
+            frame = self._cv2.imread(self.paths[self._next])
+            self._next += 1
+            if frame is not None:  # se ignoran archivos ilegibles
+                return frame
+        return None
+
+
+class FrameListSource(FrameSource):
+    """Frames ya cargados en memoria (pruebas y benchmarks)"""
     
-    def __init__(self, callback: Callable[[str], None]):
+    def __init__(self, frames: Iterable):
+        self._frames = iter(frames)
+    
+    def read(self):
+        return next(self._frames, None)
+
+
+@dataclass
+class BarcodeResolution:
+    """Resultado de decodificar una imagen en modo lote"""
+    path: str
+    barcode: Optional[str]
+    product: Optional[Product]
+
+
+def _decode_image_file(path: str, roi: Optional[tuple], max_width: Optional[int]) -> tuple:
+    """Decodificar una imagen (se ejecuta en un proceso del pool)"""
+    cv2, pyzbar, _ = load_barcode_libs()
+    frame = cv2.imread(path)
+    if frame is None:
+        return path, []
+    barcodes = pyzbar.decode(preprocess_frame(cv2, frame, roi, max_width))
+    return path, [barcode.data.decode('utf-8') for barcode in barcodes]
+
+
+class BarcodeScanner:
+    """Scanner de código de barras sobre una fuente de frames (cámara por defecto).
+    
+    La captura y la decodificación corren en hilos separados unidos por un
+    FrameBuffer; OpenCV y pyzbar liberan el GIL en su código nativo, así que
+    ambos hilos avanzan en paralelo.
+    """
+    
+    PREVIEW_TITLE = 'Scanner de Código de Barras - Presione ESC para salir'
+    
+    def __init__(self, callback: Callable[[str], None], roi: Optional[tuple] = None,
+                 max_width: Optional[int] = 640, buffer_size: int = 2,
+                 source: Optional[FrameSource] = None, show_preview: Optional[bool] = None,
+                 stop_on_first: bool = True):
+        if roi is not None:
+            x, y, w, h = roi
+            if not (0 <= x < 1 and 0 <= y < 1 and 0 < w <= 1 - x and 0 < h <= 1 - y):
+                raise ValueError("La región de interés debe estar dentro del frame (fracciones 0-1)")
         self.callback = callback
+        self.roi = roi
+        self.max_width = max_width
+        self.source = source if source is not None else CameraSource(0)
+        self.show_preview = self.source.is_live if show_preview is None else show_preview
+        self.stop_on_first = stop_on_first
         self.is_scanning = False
-        self.cap = None
+        self.metrics = ScanMetrics()
+        self._buffer = FrameBuffer(buffer_size)
+        self._seen: Set[str] = set()
+        self._decoder: Optional[threading.Thread] = None
     
     def start_scanning(self):
         """Iniciar escaneo"""
-        if not BARCODE_AVAILABLE:
-            raise Exception("Librerías de barcode no disponibles")
+        load_barcode_libs()
+        self.source.open()
         
         self.is_scanning = True
-        self.cap = cv2.VideoCapture(0)
-        
-        threading.Thread(target=self._scan_loop, daemon=True).start()
+        threading.Thread(target=self._capture_loop, daemon=True).start()
+        self._decoder = threading.Thread(target=self._decode_loop, daemon=True)
+        self._decoder.start()
     
     def stop_scanning(self):
         """Detener escaneo"""
         self.is_scanning = False
-        if self.cap:
-            self.cap.release()
-            cv2.destroyAllWindows()
-    
-    def _scan_loop(self):
-        """Loop de escaneo"""
+        self._buffer.close()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Esperar a que termine el escaneo; True si terminó"""
+        if self._decoder is not None:
+            self._decoder.join(timeout)
+            return not self._decoder.is_alive()
+        return True
+    
+    def get_metrics(self) -> Dict:
+        """FPS de captura y decodificación, latencias y frames descartados"""
+        return self.metrics.snapshot(self._buffer.dropped)
+    
+    def _capture_loop(self):
+        """Leer frames de la fuente y mostrar la vista previa"""
+        cv2, _, _ = load_barcode_libs()
+        try:
+            while self.is_scanning:
+                frame = self.source.read()
+                if frame is None:
+                    if self.source.is_live:
+                        continue
+                    break  # fin del archivo o de la lista
+                now = time.perf_counter()
+                self.metrics.record_capture(now)
+                # Las fuentes de archivo esperan al decodificador en vez de descartar
+                self._buffer.put(frame, now, drop_oldest=self.source.is_live)
+                
+                if self.show_preview:
+                    cv2.imshow(self.PREVIEW_TITLE, frame)
+                    if cv2.waitKey(1) & 0xFF == 27:  # ESC
+                        self.stop_scanning()
+        finally:
+            self._buffer.close()
+            self.source.release()
+            if self.show_preview:
+                cv2.destroyAllWindows()
+    
+    def _decode_loop(self):
+        """Decodificar los frames del buffer hasta detener o agotar la fuente"""
+        cv2, pyzbar, _ = load_barcode_libs()
         while self.is_scanning:
-            ret, frame = self.cap.read()
-            if not ret:
+            item = self._buffer.get(timeout=0.1)
+            if item is None:
+                if self._buffer.closed:
+                    break
                 continue
-            
-            # Detectar códigos de barras
-            barcodes = pyzbar.decode(frame)
+            frame, captured_at = item
+            started = time.perf_counter()
+            barcodes = pyzbar.decode(preprocess_frame(cv2, frame, self.roi, self.max_width))
+            self.metrics.record_decode(captured_at, started, time.perf_counter())
             
             for barcode in barcodes:
-                barcode_data = barcode.data.decode('utf-8')
-                
-                # Dibujar rectángulo
-                points = barcode.polygon
-                if len(points) > 4:
-                    hull = cv2.convexHull(np.array([point for point in points], dtype=np.float32))
-                    points = hull
-                
-                n = len(points)
-                for j in range(n):
-                    cv2.line(frame, tuple(points[j]), tuple(points[(j+1) % n]), (0, 255, 0), 3)
-                
-                # Mostrar datos
-                cv2.putText(frame, barcode_data, (barcode.rect.left, barcode.rect.top - 10),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                
-                # Callback
-                self.callback(barcode_data)
-                self.stop_scanning()
-                return
-            
-            # Mostrar frame
-            cv2.imshow('Scanner de Código de Barras - Presione ESC para salir', frame)
-            
-            if cv2.waitKey(1) & 0xFF == 27:  # ESC
-                break
-        
+                data = barcode.data.decode('utf-8')
+                if self.stop_on_first:
+                    self.stop_scanning()
+                    self.callback(data)
+                    return
+                if data not in self._seen:
+                    self._seen.add(data)
+                    self.callback(data)
         self.stop_scanning()
+    
+    @staticmethod
+    def decode_folder(directory: str, product_repo: ProductRepository,
+                      max_workers: Optional[int] = None, roi: Optional[tuple] = None,
+                      max_width: Optional[int] = None) -> List[BarcodeResolution]:
+        """Decodificar en paralelo todas las imágenes de un directorio.
+        
+        Cada imagen se procesa en un proceso del pool (uno por núcleo por
+        defecto) y los códigos se resuelven con ``get_by_barcode``. Las imágenes
+        sin código aparecen con ``barcode=None``.
+        """
+        load_barcode_libs()
+        paths = list_images(directory)
+        if not paths:
+            return []
+        
+        results = []
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            chunksize = max(1, len(paths) // ((max_workers or os.cpu_count() or 1) * 4))
+            decoded = pool.map(_decode_image_file, paths, [roi] * len(paths),
+                               [max_width] * len(paths), chunksize=chunksize)
+            for path, barcodes in decoded:
+                if not barcodes:
+                    results.append(BarcodeResolution(path, None, None))
+                for barcode in barcodes:
+                    results.append(BarcodeResolution(path, barcode, product_repo.get_by_barcode(barcode)))
+        return results
 
 
 # ============= PANTALLA DE LOGIN =============
@@ -1084,6 +3697,88 @@ class SearchFrame(tk.Frame):
         self.search_entry.pack(side=tk.LEFT, padx=5)
 
 
+class PagedTreeRenderer:
+    """Renderizado por diferencias y paginado de un Treeview.
+    
+    Las filas se identifican por una clave (iid); solo se insertan, modifican
+    o eliminan las filas que cambiaron, y los registros se cargan por páginas
+    a medida que el usuario se acerca al final del scroll.
+    """
+    
+    def __init__(self, tree: ttk.Treeview, scrollbar: ttk.Scrollbar,
+                 key: Callable, row: Callable, page_size: int = 200):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self._key = key  # registro -> clave única
+        self._row = row  # registro -> (values, tags)
+        self.page_size = page_size
+        self._records: Sequence = []
+        self._loaded = page_size
+        self._keys: List[str] = []
+        self._rendered: Dict[str, tuple] = {}
+        self._loading = False
+        tree.configure(yscrollcommand=self._on_yscroll)
+    
+    def set_records(self, records: Sequence, reset_scroll: bool = False) -> None:
+        """Mostrar una nueva lista de registros (solo se aplican diferencias)"""
+        self._records = records
+        if reset_scroll:
+            self._loaded = self.page_size
+        self._render()
+    
+    def update_records(self, records: Iterable) -> None:
+        """Actualizar filas ya visibles sin recalcular la lista completa"""
+        for record in records:
+            key = str(self._key(record))
+            if key in self._rendered:
+                self._apply_row(key, self._row(record))
+    
+    def _apply_row(self, key: str, row: tuple) -> None:
+        if self._rendered.get(key) != row:
+            values, tags = row
+            self.tree.item(key, values=values, tags=tags)
+            self._rendered[key] = row
+    
+    def _render(self) -> None:
+        visible = self._records[:self._loaded]
+        rows = {}
+        keys = []
+        for record in visible:
+            key = str(self._key(record))
+            keys.append(key)
+            rows[key] = self._row(record)
+        
+        removed = [key for key in self._keys if key not in rows]
+        if removed:
+            self.tree.delete(*removed)
+            for key in removed:
+                del self._rendered[key]
+        
+        for index, key in enumerate(keys):
+            if key in self._rendered:
+                self._apply_row(key, rows[key])
+            else:
+                values, tags = rows[key]
+                self.tree.insert('', index, iid=key, values=values, tags=tags)
+                self._rendered[key] = rows[key]
+        
+        if list(self.tree.get_children()) != keys:
+            for index, key in enumerate(keys):
+                self.tree.move(key, '', index)
+        self._keys = keys
+    
+    def _on_yscroll(self, first, last) -> None:
+        self.scrollbar.set(first, last)
+        if float(last) >= 0.9 and self._loaded < len(self._records) and not self._loading:
+            self._loading = True
+            self.tree.after_idle(self._load_next_page)
+    
+    def _load_next_page(self) -> None:
+        self._loaded += self.page_size
+        self._render()
+        self._loading = False
+
+
 class StatisticsPanel(tk.Frame):
     """Panel de estadísticas en tiempo real"""
     
@@ -1131,6 +3826,15 @@ class StatisticsPanel(tk.Frame):
 class InventorySystemGUI:
     """Aplicación principal con interfaz profesional"""
     
+    # Máximo de resultados mostrados al buscar
+    SEARCH_LIMIT = 500
+    # Frecuencia de lectura de cambios del inventario; agrupa ráfagas en un refresco (~1 frame)
+    REFRESH_DELAY_MS = 16
+    # Frecuencia de lectura de resultados de trabajos en segundo plano
+    JOB_POLL_MS = 100
+    # Frecuencia de liberación de reservas vencidas
+    RESERVATION_SWEEP_MS = 1000
+    
     def __init__(self, root, username: str):
         self.root = root
         self.root.title("Sistema Profesional de Gestión de Inventarios")
@@ -1145,7 +3849,17 @@ class InventorySystemGUI:
         self.movement_repo = MovementRepository()
         self.service = InventoryService(self.product_repo, self.movement_repo)
         
-        # Agregar observador para actualizar UI
+        # Agregar observador para actualizar UI; los cambios pueden llegar desde
+        # otros hilos (p. ej. MovementIngestor) y se atienden en el hilo de Tk
+        self._inventory_changes: queue.Queue = queue.Queue()
+        self._products_query = ""
+        self._inventory_query = ""
+        self._report_chunks: Optional[Iterator[str]] = None
+        
+        # Reportes y exportaciones en segundo plano
+        self.report_jobs = ReportJobExecutor()
+        self.report_cache = ReportCache(self.service)
+        self._job_handlers: Dict[int, tuple] = {}  # job_id -> (al terminar, título de error)
         self.service.add_observer(self._on_inventory_changed)
         
         # Usuario actual
@@ -1159,6 +3873,10 @@ class InventorySystemGUI:
         
         # Crear interfaz
         self._create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.root.after(self.JOB_POLL_MS, self._poll_report_jobs)
+        self.root.after(self.REFRESH_DELAY_MS, self._flush_inventory_changes)
+        self.root.after(self.RESERVATION_SWEEP_MS, self._sweep_reservations)
     
     def _configure_styles(self):
         """Configurar estilos ttk"""
@@ -1196,7 +3914,6 @@ class InventorySystemGUI:
             ]
             
             for product in products:
-                import random
                 initial_qty = random.randint(product.min_stock, product.min_stock * 3)
                 self.service.register_product(product, initial_qty, self.current_user)
             
@@ -1394,10 +4111,12 @@ class InventorySystemGUI:
         
         self.products_tree = ttk.Treeview(tree_frame,
             columns=('Código', 'Nombre', 'Categoría', 'Descripción', 'Precio', 'Stock Mín', 'Barcode'),
-            show='headings', yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+            show='headings', xscrollcommand=hsb.set)
         
         vsb.config(command=self.products_tree.yview)
         hsb.config(command=self.products_tree.xview)
+        self.products_renderer = PagedTreeRenderer(
+            self.products_tree, vsb, key=lambda p: p.code, row=self._product_row)
         
         for col, width in [('Código', 100), ('Nombre', 180), ('Categoría', 100),
                           ('Descripción', 220), ('Precio', 90), ('Stock Mín', 90), ('Barcode', 120)]:
@@ -1528,9 +4247,13 @@ class InventorySystemGUI:
         
         self.movements_tree = ttk.Treeview(tree_frame,
             columns=('Fecha/Hora', 'Código', 'Tipo', 'Cantidad', 'Usuario', 'Descripción'),
-            show='headings', yscrollcommand=vsb.set)
+            show='headings')
         
         vsb.config(command=self.movements_tree.yview)
+        self.movements_renderer = PagedTreeRenderer(
+            self.movements_tree, vsb, key=lambda m: m.movement_id, row=self._movement_row)
+        self.movements_tree.tag_configure('entry', foreground='#27ae60')
+        self.movements_tree.tag_configure('exit', foreground='#e74c3c')
         
         for col, width in [('Fecha/Hora', 160), ('Código', 100), ('Tipo', 100),
                           ('Cantidad', 100), ('Usuario', 120), ('Descripción', 300)]:
@@ -1598,7 +4321,8 @@ class InventorySystemGUI:
         self.category_filter = ttk.Combobox(control_panel, font=('Arial', 10),
                                            state='readonly', width=15)
         self.category_filter.pack(side=tk.LEFT, padx=5)
-        self.category_filter.bind('<<ComboboxSelected>>', lambda e: self._refresh_inventory_tree())
+        self.category_filter.bind('<<ComboboxSelected>>',
+                                  lambda e: self._refresh_inventory_tree(reset_scroll=True))
         
         # Búsqueda
         SearchFrame(control_panel, self._search_inventory).pack(side=tk.RIGHT, padx=5)
@@ -1613,10 +4337,12 @@ class InventorySystemGUI:
         self.inventory_tree = ttk.Treeview(tree_frame,
             columns=('Código', 'Nombre', 'Categoría', 'Precio', 'Stock', 'Reservado', 
                     'Disponible', 'Mínimo', '%', 'Estado'),
-            show='headings', yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+            show='headings', xscrollcommand=hsb.set)
         
         vsb.config(command=self.inventory_tree.yview)
         hsb.config(command=self.inventory_tree.xview)
+        self.inventory_renderer = PagedTreeRenderer(
+            self.inventory_tree, vsb, key=lambda item: item.product.code, row=self._inventory_row)
         
         columns_config = [
             ('Código', 100), ('Nombre', 200), ('Categoría', 120), ('Precio', 100),
@@ -1706,6 +4432,20 @@ class InventorySystemGUI:
                     command=lambda: self.report_text.delete(1.0, tk.END),
                     padx=15, pady=5).pack(side=tk.LEFT, padx=5)
         
+        # Avance de trabajos en segundo plano
+        ModernButton(control_frame, text='⛔ Cancelar', font=('Arial', 9, 'bold'),
+                    bg='#e74c3c', fg='white', cursor='hand2',
+                    command=self.report_jobs.cancel_all,
+                    padx=15, pady=5).pack(side=tk.RIGHT, padx=5)
+        
+        self.report_progress = ttk.Progressbar(control_frame, mode='determinate',
+                                               maximum=100, length=200)
+        self.report_progress.pack(side=tk.RIGHT, padx=5)
+        
+        self.report_status = tk.Label(control_frame, text="", font=('Arial', 9),
+                                      bg='white', fg='#7f8c8d')
+        self.report_status.pack(side=tk.RIGHT, padx=5)
+        
         # ScrolledText
         self.report_text = scrolledtext.ScrolledText(
             view_frame, font=('Courier New', 9), wrap=tk.WORD,
@@ -1824,149 +4564,202 @@ class InventorySystemGUI:
     
     def _search_products(self, query: str):
         """Buscar productos"""
-        self._refresh_products_tree(query)
+        self._products_query = query
+        self._refresh_products_tree(query, reset_scroll=True)
     
     def _search_inventory(self, query: str):
         """Buscar en inventario"""
-        self._refresh_inventory_tree(query)
+        self._inventory_query = query
+        self._refresh_inventory_tree(query, reset_scroll=True)
+    
+    def _product_row(self, product: Product) -> tuple:
+        values = (
+            product.code,
+            product.name,
+            product.category,
+            product.description,
+            f"S/ {product.price:.2f}",
+            product.min_stock,
+            product.barcode or "N/A"
+        )
+        return values, ()
+    
+    def _movement_row(self, mov: StockMovement) -> tuple:
+        mov_type = "➕ ENTRADA" if mov.movement_type == MovementType.ENTRY else "➖ SALIDA"
+        values = (
+            mov.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            mov.product_code,
+            mov_type,
+            mov.quantity,
+            mov.user,
+            mov.description
+        )
+        tag = 'entry' if mov.movement_type == MovementType.ENTRY else 'exit'
+        return values, (tag,)
+    
+    def _inventory_row(self, item: InventoryItem) -> tuple:
+        alert = self.service.get_alert_level(item.product.code) or item.get_alert_level()
+        
+        if alert == AlertLevel.CRITICAL:
+            status = "🔴 CRÍTICO"
+            tag = 'critical'
+        elif alert == AlertLevel.LOW:
+            status = "⚠️ BAJO"
+            tag = 'low'
+        else:
+            status = "✅ NORMAL"
+            tag = 'normal'
+        
+        values = (
+            item.product.code,
+            item.product.name,
+            item.product.category,
+            f"S/ {item.product.price:.2f}",
+            item.quantity,
+            item.reserved_quantity,
+            item.available_quantity,
+            item.product.min_stock,
+            f"{item.get_stock_percentage():.1f}%",
+            status
+        )
+        return values, (tag,)
     
-    def _refresh_products_tree(self, search_query: str = ""):
+    def _refresh_products_tree(self, search_query: Optional[str] = None, reset_scroll: bool = False):
         """Actualizar árbol de productos"""
-        for item in self.products_tree.get_children():
-            self.products_tree.delete(item)
+        if search_query is None:
+            search_query = self._products_query
         
         if search_query:
-            products = self.product_repo.search(search_query)
+            products = self.product_repo.search(search_query, self.SEARCH_LIMIT)
         else:
-            products = self.product_repo.get_all()
-        
-        for product in sorted(products, key=lambda p: p.code):
-            values = (
-                product.code,
-                product.name,
-                product.category,
-                product.description,
-                f"S/ {product.price:.2f}",
-                product.min_stock,
-                product.barcode or "N/A"
-            )
-            self.products_tree.insert('', tk.END, values=values)
+            products = sorted(self.product_repo.get_all(), key=lambda p: p.code)
+        
+        self.products_renderer.set_records(products, reset_scroll)
     
     def _refresh_movements_tree(self):
-        """Actualizar árbol de movimientos"""
-        for item in self.movements_tree.get_children():
-            self.movements_tree.delete(item)
-        
-        movements = self.service._movement_repo.get_all()
-        
-        for mov in reversed(movements[-100:]):
-            mov_dict = mov.to_dict()
-            mov_type = "➕ ENTRADA" if mov.movement_type == MovementType.ENTRY else "➖ SALIDA"
-            
-            values = (
-                mov_dict['timestamp'],
-                mov.product_code,
-                mov_type,
-                mov.quantity,
-                mov.user,
-                mov_dict['description']
-            )
-            
-            tag = 'entry' if mov.movement_type == MovementType.ENTRY else 'exit'
-            self.movements_tree.insert('', tk.END, values=values, tags=(tag,))
-        
-        self.movements_tree.tag_configure('entry', foreground='#27ae60')
-        self.movements_tree.tag_configure('exit', foreground='#e74c3c')
+        """Actualizar árbol de movimientos (más recientes primero)"""
+        self.movements_renderer.set_records(ReversedView(self.movement_repo.get_all_view()))
     
     def _update_category_filter(self):
         """Actualizar filtro de categorías"""
-        categories = ['Todas'] + self.product_repo.get_categories()
+        categories = ['Todas'] + sorted(self.product_repo.get_categories())
+        current = self.category_filter.get()
         self.category_filter['values'] = categories
-        self.category_filter.set('Todas')
+        self.category_filter.set(current if current in categories else 'Todas')
     
-    def _refresh_inventory_tree(self, search_query: str = ""):
+    def _refresh_inventory_tree(self, search_query: Optional[str] = None, reset_scroll: bool = False):
         """Actualizar árbol de inventario"""
-        for item in self.inventory_tree.get_children():
-            self.inventory_tree.delete(item)
-        
-        items = self.service.get_all_inventory_items()
+        if search_query is None:
+            search_query = self._inventory_query
         
         category_filter = self.category_filter.get()
-        if category_filter and category_filter != 'Todas':
-            items = [item for item in items if item.product.category == category_filter]
+        if category_filter == 'Todas':
+            category_filter = ''
         
         if search_query:
-            query_lower = search_query.lower()
-            items = [item for item in items 
-                    if query_lower in item.product.code.lower() or 
-                       query_lower in item.product.name.lower()]
+            # Resultados ya ordenados por relevancia
+            products = self.product_repo.search(search_query, self.SEARCH_LIMIT)
+            if category_filter:
+                products = [p for p in products if p.category == category_filter]
+        elif category_filter:
+            products = sorted(self.product_repo.get_by_category(category_filter), key=lambda p: p.code)
+        else:
+            products = sorted(self.product_repo.get_all(), key=lambda p: p.code)
         
-        for item in sorted(items, key=lambda x: x.product.code):
-            alert = item.get_alert_level()
-            
-            if alert == AlertLevel.CRITICAL:
-                status = "🔴 CRÍTICO"
-                tag = 'critical'
-            elif alert == AlertLevel.LOW:
-                status = "⚠️ BAJO"
-                tag = 'low'
-            else:
-                status = "✅ NORMAL"
-                tag = 'normal'
-            
-            values = (
-                item.product.code,
-                item.product.name,
-                item.product.category,
-                f"S/ {item.product.price:.2f}",
-                item.quantity,
-                item.reserved_quantity,
-                item.available_quantity,
-                item.product.min_stock,
-                f"{item.get_stock_percentage():.1f}%",
-                status
-            )
-            
-            self.inventory_tree.insert('', tk.END, values=values, tags=(tag,))
+        items = [self.service.get_inventory_item(p.code) for p in products]
+        items = [item for item in items if item is not None]
+        self.inventory_renderer.set_records(items, reset_scroll)
     
-    def _show_report(self, report_generator: ReportGenerator):
-        """Mostrar reporte"""
+    def _start_report_job(self, task: Callable, on_done: Callable, error_title: str):
+        """Lanzar un trabajo en segundo plano y registrar cómo atender su resultado"""
+        job_id = self.report_jobs.submit(task)
+        self._job_handlers[job_id] = (on_done, error_title)
+        self._update_job_status()
+    
+    def _poll_report_jobs(self):
+        """Atender resultados publicados por los hilos de reportes"""
         try:
-            report = report_generator.generate(self.service)
-            self.report_text.delete(1.0, tk.END)
-            self.report_text.insert(1.0, report)
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al generar reporte: {str(e)}")
+            while True:
+                job_id, kind, payload = self.report_jobs.results.get_nowait()
+                if kind == 'progress':
+                    done, total = payload
+                    self.report_progress['value'] = (done / total * 100) if total else 100
+                    continue
+                on_done, error_title = self._job_handlers.pop(job_id, (None, "Error"))
+                if kind == 'done':
+                    self.report_progress['value'] = 100
+                    if on_done is not None:
+                        on_done(payload)
+                elif kind == 'error':
+                    messagebox.showerror("Error", f"{error_title}: {str(payload)}")
+                elif kind == 'cancelled':
+                    self.report_progress['value'] = 0
+                self._update_job_status()
+        except queue.Empty:
+            pass
+        self.root.after(self.JOB_POLL_MS, self._poll_report_jobs)
+    
+    def _sweep_reservations(self):
+        """Liberar periódicamente las reservas vencidas"""
+        self.service.expire_reservations()
+        self.root.after(self.RESERVATION_SWEEP_MS, self._sweep_reservations)
+    
+    def _update_job_status(self):
+        active = len(self._job_handlers)
+        self.report_status.config(text=f"⏳ {active} trabajo(s) en curso" if active else "")
+    
+    def _show_report(self, report_generator: ReportGenerator):
+        """Generar el reporte en segundo plano y mostrarlo al terminar"""
+        cache = self.report_cache
+        self._start_report_job(lambda progress, cancel: cache.chunks(report_generator, cancel),
+                               self._display_report, "Error al generar reporte")
+    
+    def _display_report(self, chunks: List[str]):
+        """Mostrar el reporte insertándolo por bloques para no bloquear la interfaz"""
+        self.report_text.delete(1.0, tk.END)
+        self._report_chunks = iter(chunks)
+        self._insert_report_chunk(self._report_chunks)
+    
+    def _insert_report_chunk(self, chunks: Iterator[str]):
+        """Insertar el siguiente bloque y programar el resto"""
+        if chunks is not self._report_chunks:
+            return  # se pidió otro reporte mientras tanto
+        chunk = next(chunks, None)
+        if chunk is not None:
+            self.report_text.insert(tk.END, chunk)
+            self.root.after(1, self._insert_report_chunk, chunks)
     
     def _export_report_csv(self, report_generator: ReportGenerator):
-        """Exportar reporte a CSV"""
-        try:
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        """Exportar reporte a CSV en segundo plano"""
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if filename:
+            cache = self.report_cache
+            self._start_report_job(
+                lambda progress, cancel: cache.export_csv(report_generator, filename, progress, cancel),
+                lambda _: messagebox.showinfo("Éxito", f"✓ Reporte exportado a:\n{filename}"),
+                "Error al exportar"
             )
-            if filename:
-                report_generator.export_csv(self.service, filename)
-                messagebox.showinfo("Éxito", f"✓ Reporte exportado a:\n{filename}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al exportar: {str(e)}")
     
     def _export_report_pdf(self, report_generator: ReportGenerator):
-        """Exportar reporte a PDF"""
-        try:
-            if not PDF_AVAILABLE:
-                messagebox.showerror("Error", "ReportLab no está instalado.\nInstale con: pip install reportlab")
-                return
-            
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
+        """Exportar reporte a PDF en segundo plano"""
+        if not PDF_AVAILABLE:
+            messagebox.showerror("Error", "ReportLab no está instalado.\nInstale con: pip install reportlab")
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
+        )
+        if filename:
+            cache = self.report_cache
+            self._start_report_job(
+                lambda progress, cancel: cache.export_pdf(report_generator, filename, progress),
+                lambda _: messagebox.showinfo("Éxito", f"✓ Reporte PDF exportado a:\n{filename}"),
+                "Error al exportar PDF"
             )
-            if filename:
-                report_generator.export_pdf(self.service, filename)
-                messagebox.showinfo("Éxito", f"✓ Reporte PDF exportado a:\n{filename}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al exportar PDF: {str(e)}")
     
     def _export_inventory_csv(self):
         """Exportar inventario completo a CSV"""
@@ -2000,20 +4793,363 @@ class InventorySystemGUI:
         self._create_analytics_tab()
         messagebox.showinfo("Actualizado", "✓ Analíticas actualizadas")
     
-    def _on_inventory_changed(self):
-        """Callback cuando cambia el inventario"""
+    def _on_close(self):
+        """Cancelar trabajos pendientes y cerrar la aplicación"""
+        self.report_jobs.shutdown()
+        self.root.destroy()
+    
+    def _on_inventory_changed(self, change: InventoryChange):
+        """Callback cuando cambia el inventario (desde cualquier hilo): solo encola"""
+        self._inventory_changes.put(change)
+    
+    def _flush_inventory_changes(self):
+        """Refrescar solo las vistas afectadas por los cambios acumulados"""
+        change = None
+        try:
+            while True:
+                pending = self._inventory_changes.get_nowait()
+                if change is None:
+                    change = InventoryChange()
+                change.merge(pending)
+        except queue.Empty:
+            pass
+        self.root.after(self.REFRESH_DELAY_MS, self._flush_inventory_changes)
+        if change is None:
+            return
+        
         self.stats_panel.update_statistics()
-        self._update_category_filter()
-        self._refresh_products_tree()
-        self._refresh_inventory_tree()
-        self._refresh_movements_tree()
+        if change.catalog_changed:
+            self._update_category_filter()
+            self._refresh_products_tree()
+            self._refresh_inventory_tree()
+        elif change.product_codes:
+            # Solo cambió el stock: el orden y los filtros siguen siendo válidos
+            items = (self.service.get_inventory_item(code) for code in change.product_codes)
+            self.inventory_renderer.update_records(item for item in items if item is not None)
+        if change.movements_added:
+            self._refresh_movements_tree()
+
+
+# ============= BENCHMARK =============
+
+@dataclass
+class BenchmarkConfig:
+    """Parámetros de la carga sintética"""
+    products: int = 10000
+    movements: int = 100000
+    categories: int = 40
+    skew: float = 1.1          # exponente Zipf de popularidad (categorías y ventas)
+    exit_ratio: float = 0.7    # proporción de salidas entre los movimientos
+    searches: int = 500
+    batch_size: int = 10000
+    repository: str = 'memory'  # 'memory', 'compact' o 'sqlite'
+    seed: int = 42
+    
+    def __post_init__(self):
+        if self.products <= 0 or self.movements < 0 or self.categories <= 0:
+            raise ValueError("Tamaños de catálogo inválidos")
+        if self.repository not in ('memory', 'compact', 'sqlite'):
+            raise ValueError(f"Repositorio desconocido: {self.repository}")
+
+
+class InventoryBenchmark:
+    """Benchmark sin interfaz: genera un catálogo sintético y mide cada operación"""
+    
+    NAME_WORDS = ('Laptop', 'Mouse', 'Teclado', 'Monitor', 'Cable', 'Silla', 'Mesa', 'Lámpara',
+                  'Cuaderno', 'Bolígrafo', 'Impresora', 'Router', 'Disco', 'Memoria', 'Cámara')
+    NAME_QUALIFIERS = ('Pro', 'Básico', 'Inalámbrico', 'USB', 'HD', 'Ergonómico', 'Compacto', 'Plus')
+    
+    def __init__(self, config: BenchmarkConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.results: Dict[str, Dict] = {}
+        # Historial sintético del último año: el registro queda al inicio de la ventana
+        self._history_start = datetime.now() - timedelta(days=366)
+        self._workdir = tempfile.mkdtemp(prefix='benchmark_inventario_')
+        self.service = self._create_service()
+        self._codes: List[str] = []
+        self._sales_weights: List[float] = []
+    
+    def _create_service(self) -> InventoryService:
+        if self.config.repository == 'sqlite':
+            database = os.path.join(self._workdir, 'benchmark.db')
+            return InventoryService(SQLiteProductRepository(database), SQLiteMovementRepository(database))
+        movements = CompactMovementRepository() if self.config.repository == 'compact' else MovementRepository()
+        return InventoryService(ProductRepository(), movements)
+    
+    def _zipf_weights(self, n: int) -> List[float]:
+        """Pesos acumulados de una distribución Zipf sobre n elementos barajados"""
+        weights = [1 / (rank ** self.config.skew) for rank in range(1, n + 1)]
+        self.random.shuffle(weights)
+        cumulative, total = [], 0.0
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+        return cumulative
+    
+    def _record(self, name: str, seconds: float, operations: int, samples: Optional[List[float]] = None) -> None:
+        result = {
+            'seconds': round(seconds, 6),
+            'operations': operations,
+            'ops_per_sec': round(operations / seconds, 1) if seconds > 0 else None
+        }
+        if samples:
+            samples = sorted(samples)
+            result['ms_avg'] = round(sum(samples) / len(samples) * 1000, 4)
+            result['ms_p50'] = round(samples[len(samples) // 2] * 1000, 4)
+            result['ms_p95'] = round(samples[int(len(samples) * 0.95)] * 1000, 4)
+            result['ms_max'] = round(samples[-1] * 1000, 4)
+        self.results[name] = result
+        print(f"  {name:<40} {seconds:>10.3f} s  ({operations} ops)")
+    
+    def _time_each(self, name: str, calls: List[Callable[[], object]]) -> None:
+        samples = []
+        for call in calls:
+            started = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - started)
+        self._record(name, sum(samples), len(samples), samples)
+    
+    # ---- Fases ----
+    
+    def bench_registration(self) -> None:
+        config = self.config
+        categories = [f"Categoría {i + 1:03d}" for i in range(config.categories)]
+        category_weights = self._zipf_weights(config.categories)
+        
+        elapsed = 0.0
+        for start in range(0, config.products, config.batch_size):
+            entries = []
+            for i in range(start, min(start + config.batch_size, config.products)):
+                code = f"P{i + 1:07d}"
+                name = (f"{self.random.choice(self.NAME_WORDS)} "
+                        f"{self.random.choice(self.NAME_QUALIFIERS)} {i + 1}")
+                product = Product(code, name, f"Producto sintético {i + 1}",
+                                  round(self.random.uniform(1, 2000), 2), self.random.randint(5, 50),
+                                  self.random.choices(categories, cum_weights=category_weights)[0],
+                                  f"{7790000000000 + i}")
+                entries.append((product, self.random.randint(0, 200)))
+                self._codes.append(code)
+            started = time.perf_counter()
+            self.service.register_products(entries, "benchmark", self._history_start)
+            elapsed += time.perf_counter() - started
+        self._record('register_products', elapsed, config.products)
+        self._sales_weights = self._zipf_weights(config.products)
+    
+    def _generate_movements(self, count: int, stock: Dict[str, int], start_time: datetime,
+                            step: timedelta) -> List[StockMovement]:
+        """Movimientos con ventas sesgadas; las salidas sin stock se vuelven reposiciones"""
+        codes = self.random.choices(self._codes, cum_weights=self._sales_weights, k=count)
+        movements = []
+        for offset, code in enumerate(codes):
+            quantity = self.random.randint(1, 10)
+            timestamp = start_time + step * offset
+            if self.random.random() < self.config.exit_ratio and stock[code] >= quantity:
+                stock[code] -= quantity
+                movements.append(StockMovement(code, quantity, MovementType.EXIT, "Venta", "benchmark", timestamp))
+            else:
+                quantity *= 5
+                stock[code] += quantity
+                movements.append(StockMovement(code, quantity, MovementType.ENTRY, "Reposición", "benchmark", timestamp))
+        return movements
+    
+    def bench_movements(self) -> None:
+        config = self.config
+        stock = {code: self.service.get_inventory_item(code).available_quantity for code in self._codes}
+        # La ventana empieza después del "Stock inicial" y termina antes de ahora,
+        # así todos los lotes (y los add_stock posteriores) se anexan en orden
+        start_time = self._history_start + timedelta(days=1)
+        step = timedelta(days=365) / max(config.movements, 1)
+        
+        elapsed = 0.0
+        for start in range(0, config.movements, config.batch_size):
+            count = min(config.batch_size, config.movements - start)
+            movements = self._generate_movements(count, stock, start_time + step * start, step)
+            started = time.perf_counter()
+            self.service.apply_movements(movements)
+            elapsed += time.perf_counter() - started
+        self._record('apply_movements', elapsed, config.movements)
+        
+        # Importación de historial atrasado: un lote desordenado dentro de la ventana
+        count = min(config.batch_size, config.movements)
+        if count:
+            backfill = self._generate_movements(count, stock, start_time, step)
+            for movement in backfill:
+                movement.timestamp = start_time + step * self.random.randrange(config.movements)
+            started = time.perf_counter()
+            self.service.apply_movements(backfill)
+            self._record('apply_movements_backdated', time.perf_counter() - started, count)
+        
+        # Camino de un movimiento a la vez (el que usa la interfaz)
+        sample = self.random.choices(self._codes, k=min(1000, len(self._codes)))
+        self._time_each('add_stock', [lambda c=code: self.service.add_stock(c, 5, "Reposición", "benchmark")
+                                      for code in sample])
+        self._time_each('remove_stock', [lambda c=code: self.service.remove_stock(c, 1, "Venta", "benchmark")
+                                         for code in sample])
+    
+    def bench_search(self) -> None:
+        repo = self.service._product_repo
+        queries = []
+        for _ in range(self.config.searches):
+            code = self.random.choice(self._codes)
+            kind = self.random.random()
+            if kind < 0.25:
+                queries.append(code)                                   # código exacto
+            elif kind < 0.5:
+                queries.append(code[:4])                               # prefijo de código
+            elif kind < 0.8:
+                queries.append(self.random.choice(self.NAME_WORDS)[:5].lower())  # prefijo de nombre
+            else:
+                queries.append(self.random.choice(self.NAME_QUALIFIERS).lower())  # subcadena
+        self._time_each('search', [lambda q=q: repo.search(q, limit=InventorySystemGUI.SEARCH_LIMIT)
+                                   for q in queries])
+        self._time_each('get_by_barcode', [lambda b=f"{7790000000000 + self.random.randrange(self.config.products)}":
+                                           repo.get_by_barcode(b) for _ in range(self.config.searches)])
+        categories = repo.get_categories()
+        self._time_each('get_by_category', [lambda c=c: repo.get_by_category(c) for c in categories])
+    
+    def bench_statistics(self) -> None:
+        service = self.service
+        self._time_each('get_inventory_statistics', [service.get_inventory_statistics] * 1000)
+        self._time_each('get_most_sold_products', [lambda: service.get_most_sold_products(10)] * 100)
+        self._time_each('get_least_sold_products', [lambda: service.get_least_sold_products(10)] * 100)
+        self._time_each('get_low_stock_items', [service.get_low_stock_items] * 10)
+        self._time_each('get_critical_stock_items', [service.get_critical_stock_items] * 10)
+    
+    def bench_reports(self) -> None:
+        for report_class in ReportGenerator.__subclasses__():
+            report = report_class()
+            name = report_class.__name__
+            text_path = os.path.join(self._workdir, f"{name}.txt")
+            csv_path = os.path.join(self._workdir, f"{name}.csv")
+            
+            def write_text():
+                with open(text_path, 'w', encoding='utf-8') as f:
+                    report.write_to(self.service, f)
+            
+            self._time_each(f"report.{name}.text", [write_text])
+            self._time_each(f"report.{name}.csv", [lambda: report.export_csv(self.service, csv_path)])
+            self.results[f"report.{name}.text"]['bytes'] = os.path.getsize(text_path)
+            self.results[f"report.{name}.csv"]['bytes'] = os.path.getsize(csv_path)
+    
+    def run(self) -> Dict:
+        """Ejecutar todas las fases y devolver los resultados"""
+        print(f"Benchmark: {self.config.products} productos, {self.config.movements} movimientos "
+              f"({self.config.repository})")
+        started = time.perf_counter()
+        try:
+            for phase in (self.bench_registration, self.bench_movements, self.bench_search,
+                          self.bench_statistics, self.bench_reports):
+                phase()
+        finally:
+            shutil.rmtree(self._workdir, ignore_errors=True)
+        return {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': sys.platform,
+            'config': asdict(self.config),
+            'total_seconds': round(time.perf_counter() - started, 3),
+            'results': self.results
+        }
+
+
+def parse_cli_options(argv: List[str]) -> Dict[str, str]:
+    """Leer opciones --clave=valor de la línea de comandos"""
+    options = {}
+    for arg in argv:
+        if arg.startswith('--') and '=' in arg:
+            key, value = arg[2:].split('=', 1)
+            options[key.replace('-', '_')] = value
+    return options
+
+
+def run_benchmark(argv: List[str]) -> int:
+    """python practica.py --benchmark [--products=N --movements=N ... --output=archivo.json]"""
+    options = parse_cli_options(argv)
+    output = options.pop('output', f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    # Cada opción se convierte al tipo de su valor por defecto
+    kwargs = {name: type(getattr(BenchmarkConfig, name))(value)
+              for name, value in options.items() if name in BenchmarkConfig.__dataclass_fields__}
+    results = InventoryBenchmark(BenchmarkConfig(**kwargs)).run()
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"✓ Resultados guardados en {output}")
+    return 0
 
 
 # ============= PUNTO DE ENTRADA =============
 
+class StartupTimer:
+    """Mide la duración de cada etapa del arranque"""
+    
+    def __init__(self, start: float):
+        self._last = start
+        self.stages: List[tuple] = []
+    
+    def mark(self, stage: str) -> None:
+        """Cerrar la etapa actual con el nombre indicado"""
+        now = time.perf_counter()
+        self.stages.append((stage, (now - self._last) * 1000))
+        self._last = now
+    
+    @property
+    def total_ms(self) -> float:
+        return sum(ms for _, ms in self.stages)
+    
+    def report(self) -> str:
+        lines = ["TIEMPOS DE ARRANQUE", "-" * 40]
+        for stage, ms in self.stages:
+            lines.append(f"{stage:<28} {ms:>9.1f} ms")
+        lines.append("-" * 40)
+        lines.append(f"{'Total':<28} {self.total_ms:>9.1f} ms")
+        loaded = [name for name in OPTIONAL_MODULES if name in sys.modules]
+        lines.append(f"Módulos opcionales cargados: {', '.join(loaded) if loaded else 'ninguno'}")
+        return "\n".join(lines)
+
+
+STARTUP_TIMER = StartupTimer(_STARTUP_T0)
+STARTUP_TIMER.mark("Carga del módulo")
+
+
+def _parse_startup_budget(argv: List[str]) -> Optional[float]:
+    """Leer --startup-budget-ms=N de la línea de comandos"""
+    for arg in argv:
+        if arg.startswith('--startup-budget-ms='):
+            return float(arg.split('=', 1)[1])
+    return None
+
+
+def run_startup_timing(budget_ms: Optional[float] = None) -> int:
+    """Arrancar la interfaz sin login, medir y cerrar.
+    
+    Devuelve 1 si el arranque supera el presupuesto indicado o si se cargó
+    alguna dependencia opcional, para usarlo como control de regresiones.
+    """
+    timer = STARTUP_TIMER
+    root = tk.Tk()
+    timer.mark("Creación de ventana")
+    InventorySystemGUI(root, "benchmark")
+    timer.mark("Interfaz y datos")
+    root.update()
+    timer.mark("Primer dibujado")
+    root.destroy()
+    
+    print(timer.report())
+    failed = any(name in sys.modules for name in OPTIONAL_MODULES)
+    if budget_ms is not None and timer.total_ms > budget_ms:
+        print(f"✗ El arranque superó el presupuesto de {budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
 def main():
     """Iniciar la aplicación"""
     
+    if '--startup-timing' in sys.argv:
+        sys.exit(run_startup_timing(_parse_startup_budget(sys.argv)))
+    if '--benchmark' in sys.argv:
+        sys.exit(run_benchmark(sys.argv[1:]))
+    
     # Verificar dependencias
     warnings = []
     if not PDF_AVAILABLE:
@@ -0,0 +1,591 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+from practica import (
+    AlertLevel, CompactMovementRepository, ExportCancelled, InventoryJournal, InventoryReport,
+    InventoryService, MovementIngestor, MovementRepository, MovementType, MovementsReport, Product,
+    ProductRepository, ReportCache, ReportJobExecutor, SQLiteMovementRepository,
+    SQLiteProductRepository, SalesAnalysisReport, SortedBuckets, StockMovement
+)
+
+
+def crear_productos(cantidad: int, inicial: int = 20) -> list:
+    return [(Product(f"P{i:03d}", f"Producto {i}", f"Descripción {i}", 10.0 + i, 10,
+                     f"Categoría {i % 3}", f"750{i:010d}"), inicial)
+            for i in range(cantidad)]
+
+
+def crear_servicio(cantidad: int = 4, **options) -> InventoryService:
+    service = InventoryService(ProductRepository(), MovementRepository(), **options)
+    service.register_products(crear_productos(cantidad))
+    return service
+
+
+def estado(service: InventoryService) -> dict:
+    return {
+        item.product.code: (item.quantity, item.reserved_quantity, service.get_units_sold(item.product.code))
+        for item in service.get_all_inventory_items()
+    }
+
+
+def movimientos_aleatorios(cantidad: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    inicio = datetime(2024, 1, 1)
+    return [
+        StockMovement(f"P{rng.randrange(5):03d}", rng.randint(1, 9), rng.choice(list(MovementType)),
+                      "Carga", "test", inicio + timedelta(hours=rng.randrange(1000)))
+        for _ in range(cantidad)
+    ]
+
+
+def copiar(movements: list) -> list:
+    return [StockMovement(m.product_code, m.quantity, m.movement_type, m.description, m.user, m.timestamp)
+            for m in movements]
+
+
+def claves(movements) -> list:
+    return [(m.timestamp, m.product_code, m.quantity, m.movement_type) for m in movements]
+
+
+def comparar_movimientos(test: unittest.TestCase, referencia, *otros) -> None:
+    desde, hasta = datetime(2024, 1, 9), datetime(2024, 1, 26)
+    for repo in otros:
+        test.assertEqual(claves(repo.get_all_view()), claves(referencia.get_all_view()))
+        test.assertEqual(claves(repo.get_by_date_range(desde, hasta)),
+                         claves(referencia.get_by_date_range(desde, hasta)))
+        test.assertEqual(claves(repo.get_by_product("P002")), claves(referencia.get_by_product("P002")))
+        for movement_type in MovementType:
+            test.assertEqual(claves(repo.get_by_type(movement_type)),
+                             claves(referencia.get_by_type(movement_type)))
+            test.assertEqual(repo.get_total_quantity(movement_type),
+                             referencia.get_total_quantity(movement_type))
+            test.assertEqual(repo.get_totals_by_product(movement_type),
+                             referencia.get_totals_by_product(movement_type))
+
+
+
+class TestCodigoDeBarras(unittest.TestCase):
+    def setUp(self):
+        self.repo = ProductRepository()
+        self.repo.add(Product("A", "Mouse", "", 10.0, 5, "Accesorios", "111"))
+        self.repo.add(Product("B", "Teclado", "", 20.0, 5, "Accesorios", "222"))
+
+    def test_rechaza_codigo_de_barras_duplicado(self):
+        with self.assertRaises(ValueError):
+            self.repo.add(Product("C", "Monitor", "", 30.0, 5, "Accesorios", "111"))
+        with self.assertRaises(ValueError):
+            self.repo.update("B", Product("B", "Teclado", "", 20.0, 5, "Accesorios", "111"))
+        self.assertFalse(self.repo.exists("C"))
+        self.assertEqual(self.repo.get_by_barcode("111").code, "A")
+        self.assertEqual(self.repo.get_by_barcode("222").code, "B")
+
+    def test_update_mueve_el_codigo_de_barras(self):
+        self.repo.update("A", Product("A", "Mouse", "", 10.0, 5, "Accesorios", "333"))
+        self.assertIsNone(self.repo.get_by_barcode("111"))
+        self.assertEqual(self.repo.get_by_barcode("333").code, "A")
+        # El código liberado puede asignarse a otro producto
+        self.repo.add(Product("C", "Monitor", "", 30.0, 5, "Accesorios", "111"))
+        self.assertEqual(self.repo.get_by_barcode("111").code, "C")
+        self.repo.delete("C")
+        self.assertIsNone(self.repo.get_by_barcode("111"))
+
+
+class TestBusqueda(unittest.TestCase):
+    @staticmethod
+    def _esperado(repo: ProductRepository, query: str) -> list:
+        """Ranking de referencia calculado recorriendo todo el catálogo"""
+        def rank(product):
+            code, name = product.code.lower(), product.name.lower()
+            checks = (code == query, code.startswith(query), name.startswith(query),
+                      query in code, query in name, query in product.description.lower())
+            return next((i for i, matched in enumerate(checks) if matched), None)
+        ranked = [(rank(p), p.code.lower(), p.code) for p in repo.get_all()]
+        return [code for position, _, code in sorted(r for r in ranked if r[0] is not None)]
+
+    def test_busqueda_tras_altas_cambios_y_bajas(self):
+        rng = random.Random(11)
+        letras = "abcxyzñé1 "
+
+        def palabra(n):
+            return "".join(rng.choice(letras) for _ in range(rng.randint(1, n))).strip() or "x"
+
+        repo = ProductRepository()
+        repo.add_many([Product(f"K{i:03d}", palabra(8), palabra(12), 1.0, 1) for i in range(80)])
+        for step in range(200):
+            codes = [p.code for p in repo.get_all()]
+            operation = rng.random()
+            if operation < 0.3:
+                repo.delete(rng.choice(codes))
+            elif operation < 0.6:
+                code = rng.choice(codes)
+                repo.update(code, Product(code, palabra(8), palabra(12), 1.0, 1))
+            else:
+                code = f"K{palabra(3)}"
+                if not repo.exists(code):
+                    repo.add(Product(code, palabra(8), palabra(12), 1.0, 1))
+            query = palabra(3).lower()
+            for limit in (None, 1, 5):
+                esperado = self._esperado(repo, query)
+                self.assertEqual([p.code for p in repo.search(query, limit)],
+                                 esperado if limit is None else esperado[:limit], (step, query, limit))
+
+    def test_add_many_fallido_mantiene_los_indices(self):
+        repo = ProductRepository()
+        repo.add(Product("A1", "Mouse", "", 10.0, 5))
+        with self.assertRaises(ValueError):
+            repo.add_many([Product("B1", "Mousepad", "", 5.0, 5), Product("A1", "Otro", "", 1.0, 1)])
+        self.assertEqual([p.code for p in repo.search("mouse")], ["A1", "B1"])
+        repo.delete("B1")
+        self.assertEqual([p.code for p in repo.search("mou")], ["A1"])
+
+
+class TestRankingDeVentas(unittest.TestCase):
+    def test_ranking_de_mas_y_menos_vendidos(self):
+        service = crear_servicio(5)
+        for code, quantity in (("P001", 3), ("P003", 7), ("P001", 2), ("P004", 1)):
+            service.remove_stock(code, quantity)
+        self.assertEqual(service.get_most_sold_products(3), [("P003", 7), ("P001", 5), ("P004", 1)])
+        self.assertEqual(service.get_most_sold_products(10), [("P003", 7), ("P001", 5), ("P004", 1)])
+        self.assertEqual(service.get_least_sold_products(3), [("P000", 0), ("P002", 0), ("P004", 1)])
+        self.assertEqual(service.get_units_sold("P001"), 5)
+
+    def test_sorted_buckets_coincide_con_lista_ordenada(self):
+        rng = random.Random(3)
+        for load in (1, 2, 512):
+            buckets, reference = SortedBuckets(load), []
+            for _ in range(2000):
+                if reference and rng.random() < 0.45:
+                    value = rng.choice(reference)
+                    reference.remove(value)
+                    buckets.remove(value)
+                else:
+                    value = (rng.randint(0, 40), rng.randint(0, 20))
+                    reference.append(value)
+                    reference.sort()
+                    buckets.add(value)
+            self.assertEqual(list(buckets), reference)
+            self.assertEqual(list(reversed(buckets)), reference[::-1])
+            self.assertEqual(buckets.first(5), reference[:5])
+            with self.assertRaises(ValueError):
+                buckets.remove((99, 0))
+
+
+class TestMovimientosEnLote(unittest.TestCase):
+    def setUp(self):
+        self.service = crear_servicio(4)
+
+    def test_apply_movements_revierte_lote_invalido(self):
+        antes = estado(self.service)
+        movimientos = len(self.service._movement_repo.get_all_view())
+        lote = [
+            StockMovement("P000", 5, MovementType.ENTRY),
+            StockMovement("P001", 3, MovementType.EXIT),
+            StockMovement("P002", 500, MovementType.EXIT),  # stock insuficiente
+        ]
+        with self.assertRaises(ValueError):
+            self.service.apply_movements(lote)
+        self.assertEqual(estado(self.service), antes)
+        self.assertEqual(len(self.service._movement_repo.get_all_view()), movimientos)
+
+    def test_apply_movements_valida_el_lote_en_orden(self):
+        lote = [
+            StockMovement("P000", 30, MovementType.ENTRY),
+            StockMovement("P000", 45, MovementType.EXIT),  # válido solo tras la entrada
+        ]
+        self.service.apply_movements(lote)
+        self.assertEqual(self.service.get_inventory_item("P000").quantity, 5)
+        self.assertEqual(self.service.get_units_sold("P000"), 45)
+
+    def test_lote_atrasado_se_intercala_por_fecha(self):
+        repo = MovementRepository()
+        movimientos = movimientos_aleatorios(300)
+        repo.add_many(copiar(movimientos[:150]))
+        repo.add_many(copiar(movimientos[150:]))  # fechas anteriores a las ya cargadas
+        ordenados = sorted(movimientos, key=lambda m: m.timestamp)
+        self.assertEqual(claves(repo.get_all_view()), claves(ordenados))
+        self.assertEqual(claves(repo.get_by_product("P002")),
+                         claves(m for m in ordenados if m.product_code == "P002"))
+
+
+class TestRepositorioCompacto(unittest.TestCase):
+    def test_compacto_coincide_con_lista(self):
+        movimientos = movimientos_aleatorios(300)
+        repos = (MovementRepository(), CompactMovementRepository())
+        for repo in repos:
+            repo.add_many(copiar(movimientos[:200]))
+            for movement in copiar(movimientos[200:]):
+                repo.add(movement)
+        comparar_movimientos(self, *repos)
+        for repo in repos:
+            repo.delete(10)
+        comparar_movimientos(self, *repos)
+
+
+class TestRepositoriosSQLite(unittest.TestCase):
+    def test_productos_memoria_y_sqlite(self):
+        memoria, sqlite = ProductRepository(), SQLiteProductRepository(':memory:')
+        productos = [product for product, _ in crear_productos(60)]
+        productos.append(Product("TECH001", "Laptop Pro", "Portátil", 1500.0, 3, "Tecnología", "7790001"))
+        productos.append(Product("JARDÍN1", "Árbol Ñandú", "Decoración de ÉPOCA", 80.0, 2, "Jardín", ""))
+        productos.append(Product("árbol-2", "Maceta", "Para árbol pequeño", 15.0, 2, "Jardín", ""))
+        for repo in (memoria, sqlite):
+            repo.add_many(productos)
+            repo.update("P010", Product("P010", "Mouse Pro", "Inalámbrico", 25.0, 5, "Categoría 1", ""))
+            repo.delete("P020")
+
+        for query in ("", "p0", "P01", "pro", "producto 1", "descripción 4", "tech", "xyz",
+                      "árbol", "ÁRBOL", "ñandú", "ÑAN", "jardí", "época"):
+            self.assertEqual([p.code for p in memoria.search(query, limit=20)],
+                             [p.code for p in sqlite.search(query, limit=20)], query)
+        self.assertEqual(sorted(memoria.get_categories()), sorted(sqlite.get_categories()))
+        for category in memoria.get_categories():
+            self.assertEqual(sorted(p.code for p in memoria.get_by_category(category)),
+                             sorted(p.code for p in sqlite.get_by_category(category)))
+        self.assertEqual(memoria.get_by_barcode("7790001").code, sqlite.get_by_barcode("7790001").code)
+        self.assertIsNone(sqlite.get_by_barcode("7500000000020"))
+
+    def test_add_many_valida_codigos_y_codigos_de_barras(self):
+        for repo in (ProductRepository(), SQLiteProductRepository(':memory:')):
+            repo.add(Product("A", "Mouse", "", 10.0, 5, "Accesorios", "111"))
+            lotes = (
+                [Product("B", "Teclado", "", 20.0, 5, "Accesorios", "111")],
+                [Product("A", "Mouse", "", 10.0, 5, "Accesorios", "")],
+                [Product("C", "Monitor", "", 30.0, 5, "Accesorios", "333"),
+                 Product("D", "Cable", "", 5.0, 5, "Accesorios", "333")],
+                [Product("E", "Silla", "", 50.0, 5, "Muebles", ""),
+                 Product("E", "Silla", "", 50.0, 5, "Muebles", "")],
+            )
+            for lote in lotes:
+                with self.assertRaises(ValueError):
+                    repo.add_many(lote)
+            self.assertEqual(repo.get_by_barcode("111").code, "A")
+
+    def test_movimientos_memoria_y_sqlite(self):
+        movimientos = movimientos_aleatorios(300)
+        repos = (MovementRepository(), SQLiteMovementRepository(':memory:'))
+        for repo in repos:
+            repo.add_many(copiar(movimientos[:200]))
+            for movement in copiar(movimientos[200:]):
+                repo.add(movement)
+        comparar_movimientos(self, *repos)
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='test_journal_')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _service(self, **options) -> InventoryService:
+        return InventoryService(ProductRepository(), MovementRepository(),
+                                journal=InventoryJournal(self.directory, **options))
+
+    def test_snapshot_y_reproduccion_del_log(self):
+        service = self._service(snapshot_every=10)
+        service.register_products(crear_productos(5))
+        for i in range(30):
+            service.add_stock(f"P{i % 5:03d}", 3, "Reposición")
+            service.remove_stock(f"P{(i + 1) % 5:03d}", 2, "Venta")
+        service._journal.close()
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'snapshot.json')))
+
+        restored = self._service()
+        self.assertEqual(estado(restored), estado(service))
+        self.assertEqual(restored.get_inventory_statistics(), service.get_inventory_statistics())
+
+    def test_registro_final_incompleto_se_trunca(self):
+        service = self._service(snapshot_every=1000)
+        service.register_products(crear_productos(3))
+        service.add_stock("P000", 5)
+        service._journal.close()
+        log_path = os.path.join(self.directory, 'journal.log')
+        size = os.path.getsize(log_path)
+        with open(log_path, 'ab') as f:
+            f.write(b'\x01\x02\x03')  # escritura interrumpida a mitad de la cabecera
+
+        restored = self._service()
+        self.assertEqual(estado(restored), estado(service))
+        self.assertEqual(os.path.getsize(log_path), size)
+
+    def test_totales_por_tipo_sobreviven_al_snapshot(self):
+        service = self._service(snapshot_every=5)
+        service.register_products(crear_productos(1))
+        for _ in range(10):
+            service.remove_stock("P000", 1, "Venta")
+        service._journal.close()
+
+        restored = self._service()
+        self.assertEqual(restored.get_units_sold("P000"), 10)
+        self.assertEqual(restored.get_movement_total(MovementType.EXIT), 10)
+        self.assertEqual(restored.get_movement_total(MovementType.ENTRY), 20)
+        # El historial previo al snapshot no se recarga, pero el reporte usa los totales
+        self.assertLess(len(restored._movement_repo.get_all_view()), 11)
+        self.assertEqual(SalesAnalysisReport().generate(restored), SalesAnalysisReport().generate(service))
+
+    def test_rechaza_repositorios_persistentes_o_poblados(self):
+        with self.assertRaises(ValueError):
+            InventoryService(SQLiteProductRepository(':memory:'), SQLiteMovementRepository(':memory:'),
+                             journal=InventoryJournal(self.directory))
+        poblado = ProductRepository()
+        poblado.add(Product("A", "Mouse", "", 10.0, 5))
+        with self.assertRaises(ValueError):
+            InventoryService(poblado, MovementRepository(), journal=InventoryJournal(self.directory))
+
+
+class TestExportacionCSV(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='test_csv_')
+        self.service = crear_servicio(3)
+        self.service.apply_movements([StockMovement("P000", 1, MovementType.ENTRY)
+                                      for _ in range(2 * MovementsReport.CSV_CHUNK_ROWS)])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_exportacion_informa_avance(self):
+        path = os.path.join(self.directory, 'movimientos.csv')
+        avance = []
+        MovementsReport().export_csv(self.service, path, progress=lambda done, total: avance.append(done))
+        total = 2 * MovementsReport.CSV_CHUNK_ROWS + 3
+        self.assertEqual(avance[-1], total)
+        self.assertEqual(avance, sorted(avance))
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(sum(1 for _ in f), total + 1)
+
+    def test_cancelar_elimina_el_archivo(self):
+        path = os.path.join(self.directory, 'movimientos.csv')
+        cancel = threading.Event()
+        cancel.set()
+        with self.assertRaises(ExportCancelled):
+            MovementsReport().export_csv(self.service, path, cancel=cancel)
+        self.assertFalse(os.path.exists(path))
+
+
+class TestTrabajosEnSegundoPlano(unittest.TestCase):
+    def setUp(self):
+        self.executor = ReportJobExecutor(max_workers=2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def _mensajes(self, job_id: int) -> list:
+        mensajes = []
+        while not mensajes or mensajes[-1][1] == 'progress':
+            received, kind, payload = self.executor.results.get(timeout=5)
+            if received == job_id:
+                mensajes.append((received, kind, payload))
+        return mensajes
+
+    def test_resultado_y_avance(self):
+        def tarea(progress, cancel):
+            progress(1, 2)
+            progress(2, 2)
+            return "listo"
+
+        job_id = self.executor.submit(tarea)
+        self.assertEqual(self._mensajes(job_id), [(job_id, 'progress', (1, 2)), (job_id, 'progress', (2, 2)),
+                                                   (job_id, 'done', "listo")])
+        self.assertEqual(self.executor.active_jobs(), 0)
+
+    def test_error(self):
+        def tarea(progress, cancel):
+            raise ValueError("falló")
+
+        job_id = self.executor.submit(tarea)
+        (_, kind, payload), = self._mensajes(job_id)
+        self.assertEqual(kind, 'error')
+        self.assertIsInstance(payload, ValueError)
+
+    def test_cancelar(self):
+        iniciado = threading.Event()
+
+        def tarea(progress, cancel):
+            iniciado.set()
+            while not cancel.wait(0.01):
+                pass
+            raise ExportCancelled("cancelado")
+
+        job_id = self.executor.submit(tarea)
+        self.assertTrue(iniciado.wait(5))
+        self.executor.cancel(job_id)
+        self.assertEqual(self._mensajes(job_id), [(job_id, 'cancelled', None)])
+
+
+class TestCacheDeReportes(unittest.TestCase):
+    def setUp(self):
+        self.service = crear_servicio(4)
+
+    def test_acierto_y_fallo_segun_version(self):
+        cache = ReportCache(self.service)
+        primero = cache.generate(InventoryReport())
+        self.assertEqual(cache.generate(InventoryReport()), primero)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        self.service.add_stock("P000", 5)
+        segundo = cache.generate(InventoryReport())
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertNotEqual(segundo, primero)
+        self.assertEqual(segundo, InventoryReport().generate(self.service))
+
+    def test_expulsa_la_entrada_menos_usada(self):
+        cache = ReportCache(self.service, max_entries=2)
+        cache.generate(InventoryReport())
+        cache.generate(MovementsReport())
+        cache.generate(InventoryReport())       # InventoryReport pasa a ser el más reciente
+        cache.generate(SalesAnalysisReport())   # expulsa MovementsReport
+        self.assertEqual(len(cache), 2)
+        hits = cache.hits
+        cache.generate(InventoryReport())
+        self.assertEqual(cache.hits, hits + 1)
+        cache.generate(MovementsReport())
+        self.assertEqual(cache.hits, hits + 1)
+
+
+class TestConcurrencia(unittest.TestCase):
+    def test_escrituras_concurrentes(self):
+        service = crear_servicio(4)
+        codes = [f"P{i:03d}" for i in range(4)]
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(500):
+                code = rng.choice(codes)
+                service.add_stock(code, 2)
+                service.remove_stock(code, 1)
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        items = service.get_all_inventory_items()
+        self.assertEqual(sum(item.quantity for item in items), 4 * 20 + 8 * 500)
+        self.assertEqual(sum(service.get_units_sold(code) for code in codes), 8 * 500)
+        self.assertEqual(service.get_inventory_statistics()['total_items'], 4 * 20 + 8 * 500)
+        self.assertEqual(len(service._movement_repo.get_all_view()), 4 + 8 * 500 * 2)
+
+
+class TestIngesta(unittest.TestCase):
+    def setUp(self):
+        self.service = crear_servicio(2)
+        self.ingestor = MovementIngestor(self.service, max_wait=0.05).start()
+
+    def tearDown(self):
+        self.ingestor.stop(timeout=5)
+
+    def test_futures_y_reintento_individual(self):
+        futures = [
+            self.ingestor.submit(StockMovement("P000", 5, MovementType.EXIT)),
+            self.ingestor.submit(StockMovement("P001", 500, MovementType.EXIT)),  # inválido
+            self.ingestor.submit(StockMovement("P001", 3, MovementType.ENTRY)),
+            self.ingestor.submit(StockMovement("X999", 1, MovementType.ENTRY)),   # no existe
+        ]
+        self.assertEqual(futures[0].result(timeout=5).quantity, 5)
+        with self.assertRaises(ValueError):
+            futures[1].result(timeout=5)
+        self.assertEqual(futures[2].result(timeout=5).product_code, "P001")
+        with self.assertRaises(ValueError):
+            futures[3].result(timeout=5)
+
+        self.assertEqual(self.service.get_inventory_item("P000").quantity, 15)
+        self.assertEqual(self.service.get_inventory_item("P001").quantity, 23)
+        metrics = self.ingestor.get_metrics()
+        self.assertEqual((metrics['submitted'], metrics['applied'], metrics['failed']), (4, 2, 2))
+        self.assertEqual(metrics['queue_depth'], 0)
+        self.assertGreaterEqual(metrics['batches'], 1)
+
+    def test_stop_aplica_lo_pendiente(self):
+        futures = [self.ingestor.submit(StockMovement("P000", 1, MovementType.ENTRY)) for _ in range(50)]
+        self.ingestor.stop(timeout=5)
+        self.assertTrue(all(future.done() for future in futures))
+        self.assertEqual(self.service.get_inventory_item("P000").quantity, 70)
+        with self.assertRaises(RuntimeError):
+            self.ingestor.submit(StockMovement("P000", 1, MovementType.ENTRY))
+
+
+class TestReservas(unittest.TestCase):
+    def setUp(self):
+        self.service = crear_servicio(4)
+
+    def test_reserva_vence_y_libera_stock(self):
+        reserva = self.service.reserve_stock("P000", 5, "Pedido", ttl=timedelta(minutes=5))
+        item = self.service.get_inventory_item("P000")
+        self.assertEqual(item.available_quantity, 15)
+        self.assertEqual(self.service.expire_reservations(), [])
+
+        vencidas = self.service.expire_reservations(datetime.now() + timedelta(minutes=10))
+        self.assertEqual([r.reservation_id for r in vencidas], [reserva.reservation_id])
+        self.assertEqual(item.available_quantity, 20)
+        self.assertIsNone(self.service.get_reservation(reserva.reservation_id))
+
+    def test_confirmar_reserva_registra_salida(self):
+        reserva = self.service.reserve_stock("P001", 4, "Pedido")
+        with self.assertRaises(ValueError):
+            self.service.remove_stock("P001", 17)
+        movimiento = self.service.commit_reservation(reserva.reservation_id)
+        item = self.service.get_inventory_item("P001")
+        self.assertEqual(movimiento.movement_type, MovementType.EXIT)
+        self.assertEqual((item.quantity, item.reserved_quantity), (16, 0))
+        self.assertEqual(self.service.get_units_sold("P001"), 4)
+        with self.assertRaises(ValueError):
+            self.service.release_reservation(reserva.reservation_id)
+
+    def test_reservas_sobreviven_al_journal(self):
+        directory = tempfile.mkdtemp(prefix='test_reservas_')
+        self.addCleanup(shutil.rmtree, directory, True)
+        service = InventoryService(ProductRepository(), MovementRepository(),
+                                   journal=InventoryJournal(directory, snapshot_every=4))
+        service.register_products(crear_productos(2))
+        primera = service.reserve_stock("P000", 4, "Pedido 1")
+        service.reserve_stock("P001", 1, "Pedido 2", ttl=timedelta(minutes=5))
+        service.commit_reservation(primera.reservation_id)
+        service.reserve_stock("P000", 2, "Pedido 3")
+        service._journal.close()
+
+        restored = InventoryService(ProductRepository(), MovementRepository(),
+                                    journal=InventoryJournal(directory))
+        self.assertEqual(estado(restored), estado(service))
+        self.assertEqual(sorted(r.reservation_id for r in restored.get_reservations()),
+                         ["RES-000002", "RES-000003"])
+        self.assertEqual(restored.reserve_stock("P001", 1).reservation_id, "RES-000004")
+
+
+class TestAlertasDeStock(unittest.TestCase):
+    def setUp(self):
+        self.service = crear_servicio(4)  # mínimo 10, stock inicial 20
+        self.eventos = []
+        self.service.add_observer(lambda change: self.eventos.extend(change.alerts))
+
+    def test_evento_solo_al_cruzar_un_umbral(self):
+        self.service.remove_stock("P000", 5)    # 15: sigue normal
+        self.assertEqual(self.eventos, [])
+        self.service.remove_stock("P000", 6)    # 9: bajo
+        self.service.remove_stock("P000", 1)    # 8: sigue bajo
+        self.service.remove_stock("P000", 7)    # 1: crítico
+        self.service.add_stock("P000", 20)      # 21: normal
+        self.assertEqual([(e.product_code, e.old_level, e.new_level, e.quantity) for e in self.eventos], [
+            ("P000", AlertLevel.NORMAL, AlertLevel.LOW, 9),
+            ("P000", AlertLevel.LOW, AlertLevel.CRITICAL, 1),
+            ("P000", AlertLevel.CRITICAL, AlertLevel.NORMAL, 21),
+        ])
+
+    def test_items_ordenados_por_criticidad(self):
+        self.service.remove_stock("P001", 12)   # 8 -> bajo
+        self.service.remove_stock("P002", 19)   # 1 -> crítico
+        self.service.remove_stock("P003", 15)   # 5 -> bajo
+        self.assertEqual([i.product.code for i in self.service.get_low_stock_items()], ["P002", "P003", "P001"])
+        self.assertEqual([i.product.code for i in self.service.get_critical_stock_items()], ["P002"])
+        self.assertEqual([i.product.code for i in self.service.get_most_critical_items(2)], ["P002", "P003"])
+        self.assertEqual(self.service.get_inventory_statistics()['low_stock_count'], 3)
+        self.assertEqual(self.service.get_alert_level("P000"), AlertLevel.NORMAL)
+
+
+if __name__ == '__main__':
+    unittest.main()